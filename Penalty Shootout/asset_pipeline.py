@@ -0,0 +1,103 @@
+# Caricamento degli asset: i file si cercano accanto al modulo (non nella
+# cartella corrente) in più formati, e le immagini già scalate si salvano in
+# una cache su disco. Ai lanci successivi si salta decodifica e smoothscale:
+# basta leggere i pixel grezzi e convertirli nel formato del display.
+import hashlib
+import os
+import struct
+
+import pygame
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ASSET_DIR, ".asset_cache")
+CACHE_VERSION = 1
+
+IMAGE_EXTENSIONS = (".png", ".webp", ".jpeg", ".jpg", ".bmp", ".gif")
+SOUND_EXTENSIONS = (".wav", ".ogg", ".mp3")
+
+# magic, versione, larghezza, altezza, alpha
+_HEADER = struct.Struct("<4sHIIB")
+_MAGIC = b"PSAC"
+
+
+def resolve(name, extensions, directory=ASSET_DIR):
+    for ext in extensions:
+        path = os.path.join(directory, name + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _cache_path(path, size, scale, alpha):
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read())
+    digest.update(repr((CACHE_VERSION, size, scale, alpha)).encode())
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest.hexdigest()[:16]}.surf")
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, w, h, alpha = _HEADER.unpack_from(data)
+    fmt = "RGBA" if alpha else "RGB"
+    if magic != _MAGIC or version != CACHE_VERSION or len(data) != _HEADER.size + w * h * len(fmt):
+        return None
+    return pygame.image.frombytes(data[_HEADER.size:], (w, h), fmt)
+
+
+def _write_cache(cache_path, img, alpha):
+    fmt = "RGBA" if alpha else "RGB"
+    w, h = img.get_size()
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, CACHE_VERSION, w, h, int(alpha)))
+            f.write(pygame.image.tobytes(img, fmt))
+        # Scrittura atomica: un processo che legge non vede mai un file a metà
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Cannot write asset cache {cache_path}: {e}")
+
+
+def decode_image(name, size=None, scale=None, alpha=True):
+    # Superficie scalata ma non ancora convertita nel formato del display:
+    # non tocca il display, quindi si può chiamare da un thread in background.
+    # None se il file non esiste.
+    path = resolve(name, IMAGE_EXTENSIONS)
+    if path is None:
+        return None
+
+    cache_path = _cache_path(path, size, scale, alpha)
+    img = _read_cache(cache_path)
+    if img is not None:
+        return img
+
+    img = pygame.image.load(path)
+    if img.get_bitsize() < 24:
+        # smoothscale vuole superfici a 24/32 bit (es. PNG con palette)
+        img = pygame.Surface(img.get_size(), pygame.SRCALPHA, 32)
+        img.blit(pygame.image.load(path), (0, 0))
+    if scale:
+        img = pygame.transform.smoothscale(img, (int(img.get_width() * scale), int(img.get_height() * scale)))
+    elif size:
+        img = pygame.transform.smoothscale(img, size)
+    _write_cache(cache_path, img, alpha)
+    return img
+
+
+def convert_image(img, alpha=True):
+    return img.convert_alpha() if alpha else img.convert()
+
+
+def load_sound(name):
+    path = resolve(name, SOUND_EXTENSIONS)
+    if path is None:
+        return None
+    return pygame.mixer.Sound(path)
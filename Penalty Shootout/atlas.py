@@ -0,0 +1,120 @@
+# Atlante di sprite: ogni variante (cerchio di un dato raggio e colore,
+# rettangolo, fiche...) si rasterizza una sola volta in una superficie
+# condivisa, e un frame disegna tutte le particelle con un'unica chiamata
+# Surface.blits invece di una pygame.draw per ognuna.
+from itertools import repeat
+
+import numpy as np
+import pygame
+
+from render_scale import PixelBlits, ScaledSurface, draw_circle
+from sprites import new_surface
+
+ATLAS_SIZE = (512, 512)
+# Colore trasparente dell'atlante: nessuno sprite del gioco lo usa
+ATLAS_KEY = (255, 0, 255)
+# Chiave di una variante di particella: indice del colore * KEY_STRIDE + raggio
+KEY_STRIDE = 1024
+
+
+class SpriteAtlas:
+    def __init__(self, size=ATLAS_SIZE):
+        self.size = size
+        self.surface = None
+        self.areas = {}
+        # Impacchettamento a scaffali: posizione libera e altezza della riga
+        self.shelf_x = 0
+        self.shelf_y = 0
+        self.shelf_height = 0
+
+    def _allocate(self, w, h):
+        width, height = self.surface.get_size()
+        if self.shelf_x + w > width:
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+        if w > width or self.shelf_y + h > height:
+            self._grow(max(width, w), height * 2 + h)
+            return self._allocate(w, h)
+        rect = pygame.Rect(self.shelf_x, self.shelf_y, w, h)
+        self.shelf_x += w
+        self.shelf_height = max(self.shelf_height, h)
+        return rect
+
+    def _grow(self, width, height):
+        old = self.surface
+        self.surface = new_surface((width, height), 0, old)
+        self.surface.fill(ATLAS_KEY)
+        self.surface.set_colorkey(ATLAS_KEY)
+        self.surface.blit(old, (0, 0))
+
+    def sprite(self, key, size, draw, like=None):
+        # Area dell'atlante con lo sprite key; draw(surface) lo disegna su una
+        # superficie di dimensione size la prima volta che serve
+        area = self.areas.get(key)
+        if area is None:
+            if self.surface is None:
+                self.surface = new_surface(self.size, 0, like) if like else new_surface(self.size)
+                self.surface.fill(ATLAS_KEY)
+                self.surface.set_colorkey(ATLAS_KEY)
+            area = self.areas[key] = self._allocate(*size)
+            draw(self.surface.subsurface(area))
+        return area
+
+    def circle(self, color, radius, like=None):
+        # Come pygame.draw.circle(surface, color, (r, r), r); None se radius < 1
+        if radius < 1:
+            return None
+        size = radius * 2 + 1
+        return self.sprite(("circle", color, radius), (size, size),
+                           lambda s: draw_circle(s, color, (radius, radius), radius), like)
+
+    def rect(self, color, w, h, like=None):
+        return self.sprite(("rect", color, w, h), (w, h), lambda s: s.fill(color), like)
+
+    def particle_blits(self, particles, like=None):
+        # Voci per surface.blits con un cerchio per particella, come
+        # pygame.draw.circle(surface, color, (int(x), int(y)), int(size)).
+        # Chiavi e posizioni si calcolano sugli array NumPy: in Python resta
+        # solo la costruzione delle coppie (x, y)
+        n = len(particles)
+        radii = particles.size[:n].astype(np.int64)
+        visible = radii >= 1
+        radii = radii[visible]
+        keys = particles.color[:n][visible].astype(np.int64) * KEY_STRIDE + radii
+        palette = particles.palette
+        areas = {key: self.circle(palette[key // KEY_STRIDE], key % KEY_STRIDE, like)
+                 for key in np.unique(keys).tolist()}
+        xs = particles.x[:n][visible].astype(np.int64) - radii
+        ys = particles.y[:n][visible].astype(np.int64) - radii
+        return self._blits(xs, ys, areas, keys)
+
+    def particle_rect_blits(self, particles, w, h, like=None):
+        # Come pygame.draw.rect(surface, color, (int(x), int(y), w, h))
+        n = len(particles)
+        keys = particles.color[:n]
+        palette = particles.palette
+        areas = {key: self.rect(palette[key], w, h, like) for key in np.unique(keys).tolist()}
+        xs = particles.x[:n].astype(np.int64)
+        ys = particles.y[:n].astype(np.int64)
+        return self._blits(xs, ys, areas, keys)
+
+    def _blits(self, xs, ys, areas, keys):
+        surface = self.surface
+        if isinstance(surface, ScaledSurface):
+            # Atlante alla scala di rendering: posizioni e aree si convertono
+            # in pixel veri qui, invece che voce per voce in blits
+            xs = np.round(xs * surface.scale).astype(np.int64)
+            ys = np.round(ys * surface.scale).astype(np.int64)
+            areas = {key: surface.area(area) for key, area in areas.items()}
+            return PixelBlits(zip(repeat(surface.surface), zip(xs.tolist(), ys.tolist()),
+                                  map(areas.__getitem__, keys.tolist())))
+        return zip(repeat(surface), zip(xs.tolist(), ys.tolist()), map(areas.__getitem__, keys.tolist()))
+
+    def clear(self):
+        self.surface = None
+        self.areas.clear()
+        self.shelf_x = self.shelf_y = self.shelf_height = 0
+
+
+atlas = SpriteAtlas()
@@ -0,0 +1,348 @@
+# Benchmark headless delle schermate: MainMenu, BettingScreen e PenaltyGame
+# girano con i driver SDL dummy e input scriptato, e per ogni scenario si
+# misurano handle_events, update, draw e flip separatamente, più le
+# allocazioni per frame. Il risultato si confronta con un baseline salvato:
+# un aumento oltre la soglia fa fallire l'esecuzione, e così la mancanza del
+# baseline.
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import rigori
+import sprites
+from atlas import atlas
+from particles import ParticleSystem
+from rules import WIDTH, HEIGHT, TARGET_POSITIONS
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+THRESHOLD = 0.20
+FRAMES = 600
+WARMUP = 60
+PHASES = ("handle_events", "update", "draw", "flip")
+PARTICLE_COUNTS = (100, 1000, 10000)
+
+
+class ScriptedInput:
+    # Eventi iniettati nella coda reale: le schermate leggono la posizione
+    # del mouse da event.pos
+    def __init__(self):
+        self.pos = (0, 0)
+
+    def move(self, pos):
+        self.pos = pos
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0)))
+
+    def click(self, pos):
+        self.pos = pos
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+
+    def key(self, key=pygame.K_SPACE):
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=" ", scancode=0))
+
+
+class Scenario:
+    name = None
+
+    def __init__(self, assets, rng):
+        self.assets = assets
+        self.rng = rng
+
+    def script(self, frame, inp):
+        pass
+
+    def handle_events(self):
+        return self.scene.handle_events()
+
+    def update(self):
+        self.scene.update()
+
+    def draw(self, surface):
+        self.scene.draw(surface)
+
+
+class IdleMenu(Scenario):
+    name = "idle_menu"
+
+    def __init__(self, assets, rng):
+        super().__init__(assets, rng)
+        self.scene = rigori.MainMenu(rng)
+
+
+class ChipSpam(Scenario):
+    # Una fiche da 10 a ogni frame su un saldo enorme: la pila cresce sempre
+    name = "chip_spam"
+
+    def __init__(self, assets, rng):
+        super().__init__(assets, rng)
+        self.scene = rigori.BettingScreen(10 ** 9, rng)
+        chip = self.scene.chips[0]
+        self.chip_pos = (chip.x, chip.y)
+
+    def script(self, frame, inp):
+        inp.click(self.chip_pos)
+
+    def handle_events(self):
+        return self.scene.handle_events(self.assets)
+
+    def draw(self, surface):
+        self.scene.draw(surface, self.assets)
+
+
+class ShotInFlight(Scenario):
+    # Tiri continui: bersaglio, volo della palla, esito, tasto, e di nuovo
+    name = "shot_in_flight"
+
+    def __init__(self, assets, rng):
+        super().__init__(assets, rng)
+        self.scene = rigori.PenaltyGame(assets, 10 ** 9, 10, rng)
+
+    def script(self, frame, inp):
+        game = self.scene
+        if game.result_text:
+            inp.key()
+        elif not game.ball_moving:
+            inp.click(TARGET_POSITIONS[frame % len(TARGET_POSITIONS)])
+
+
+class WinEffectStorm(Scenario):
+    # Effetti di vincita e scia della palla sempre al massimo
+    name = "win_effect_storm"
+
+    def __init__(self, assets, rng):
+        super().__init__(assets, rng)
+        self.scene = rigori.PenaltyGame(assets, 10 ** 9, 10, rng)
+
+    def script(self, frame, inp):
+        game = self.scene
+        for i in range(4):
+            game.add_win_effect(100 + i)
+        inp.move((WIDTH // 2, HEIGHT - 45) if frame % 30 < 15 else (0, 0))
+
+
+class GameOverOverlay(Scenario):
+    name = "game_over"
+
+    def __init__(self, assets, rng):
+        super().__init__(assets, rng)
+        self.scene = rigori.PenaltyGame(assets, 0, 100, rng)
+        self.scene.result_text = "PARATA!"
+        self.scene.result_details = "Hai perso $500!"
+        self.scene.game_over = True
+
+
+SCENARIOS = {cls.name: cls for cls in (IdleMenu, ChipSpam, ShotInFlight, WinEffectStorm, GameOverOverlay)}
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {"mean": sum(ordered) / n, "p95": ordered[min(n - 1, int(n * 0.95))], "max": ordered[-1]}
+
+
+def run_frames(scenario, screen, inp, frames, timings=None, allocations=None):
+    clock = time.perf_counter
+    for frame in range(frames):
+        scenario.script(frame, inp)
+        if allocations is not None:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            surfaces = sprites.surface_allocations
+
+        t0 = clock()
+        scenario.handle_events()
+        t1 = clock()
+        scenario.update()
+        t2 = clock()
+        scenario.draw(screen)
+        t3 = clock()
+        pygame.display.flip()
+        t4 = clock()
+
+        if timings is not None:
+            for phase, start, end in zip(PHASES, (t0, t1, t2, t3), (t1, t2, t3, t4)):
+                timings[phase].append((end - start) * 1000)
+        if allocations is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            allocations["bytes"].append(peak - before)
+            allocations["retained"].append(current - before)
+            allocations["surfaces"].append(sprites.surface_allocations - surfaces)
+
+
+def run_scenario(name, screen, assets, frames=FRAMES, warmup=WARMUP, seed=0):
+    def fresh():
+        pygame.event.clear()
+        return SCENARIOS[name](assets, rigori.GameRNG(seed))
+
+    inp = ScriptedInput()
+    # Passata cronometrata, senza tracemalloc che falserebbe i tempi
+    scenario = fresh()
+    run_frames(scenario, screen, inp, warmup)
+    timings = {phase: [] for phase in PHASES}
+    run_frames(scenario, screen, inp, frames, timings=timings)
+
+    # Passata separata per le allocazioni, sugli stessi frame
+    scenario = fresh()
+    run_frames(scenario, screen, inp, warmup)
+    allocations = {"bytes": [], "retained": [], "surfaces": []}
+    tracemalloc.start()
+    try:
+        run_frames(scenario, screen, inp, frames, allocations=allocations)
+    finally:
+        tracemalloc.stop()
+
+    result = {phase: summarize(samples) for phase, samples in timings.items()}
+    frame_totals = [sum(t) for t in zip(*timings.values())]
+    result["frame"] = summarize(frame_totals)
+    result["alloc_bytes_per_frame"] = sum(allocations["bytes"]) / frames
+    result["retained_bytes_per_frame"] = sum(allocations["retained"]) / frames
+    result["surfaces_per_frame"] = sum(allocations["surfaces"]) / frames
+    return result
+
+
+def particle_benchmark(screen, counts=PARTICLE_COUNTS, frames=200, seed=0):
+    # Stesse particelle disegnate con una pygame.draw.circle ciascuna (come
+    # prima dell'atlante) e con un solo blits; tempo medio per frame in ms.
+    # Entrambe le misure comprendono la lettura degli array delle particelle
+    rng = random.Random(seed)
+    results = {}
+    for n in counts:
+        p = ParticleSystem(n)
+        p.emit([rng.uniform(0, WIDTH) for _ in range(n)], [rng.uniform(0, HEIGHT) for _ in range(n)],
+               [rng.choice(rigori.CHIPS_COLORS) for _ in range(n)],
+               size=[rng.randint(2, 5) for _ in range(n)])
+        def primitives():
+            for x, y, size, color in zip(p.ints("x"), p.ints("y"), p.ints("size"), p.colors()):
+                pygame.draw.circle(screen, color, (x, y), size)
+
+        def batched():
+            screen.blits(atlas.particle_blits(p, screen), doreturn=False)
+
+        times = {}
+        for name, draw in (("primitives", primitives), ("atlas", batched)):
+            draw()
+            start = time.perf_counter()
+            for _ in range(frames):
+                draw()
+            times[name] = (time.perf_counter() - start) / frames * 1000
+        results[n] = times
+        print(f"{n:>6} particelle  draw.circle {times['primitives']:8.3f} ms  "
+              f"atlante {times['atlas']:8.3f} ms  x{times['primitives'] / times['atlas']:.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Regressione: media per fase oltre baseline * (1 + soglia). Sotto i
+    # 0.05 ms si ignora, è rumore del timer
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for phase in PHASES + ("frame",):
+            old, new = base[phase]["mean"], result[phase]["mean"]
+            if new > old * (1 + threshold) and new - old > 0.05:
+                regressions.append((name, phase, old, new))
+        if result["surfaces_per_frame"] > base["surfaces_per_frame"]:
+            regressions.append((name, "surfaces_per_frame", base["surfaces_per_frame"],
+                                result["surfaces_per_frame"]))
+    return regressions
+
+
+def print_results(results, baseline):
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        print(f"{name}")
+        for phase in PHASES + ("frame",):
+            r = result[phase]
+            line = f"  {phase:<14} media {r['mean']:7.3f} ms  p95 {r['p95']:7.3f} ms  max {r['max']:7.3f} ms"
+            if phase in base:
+                old = base[phase]["mean"]
+                line += f"  ({(r['mean'] - old) / old:+.0%} sul baseline)" if old else ""
+            print(line)
+        print(f"  allocazioni   {result['alloc_bytes_per_frame'] / 1024:7.1f} KiB/frame  "
+              f"trattenute {result['retained_bytes_per_frame']:7.1f} B/frame  "
+              f"superfici {result['surfaces_per_frame']:.3f}/frame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless delle schermate")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenari da eseguire, tra {', '.join(SCENARIOS)} (default: tutti)")
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="salva i risultati come nuovo baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="aumento relativo tollerato sul baseline (0.2 = 20%%)")
+    parser.add_argument("--json", default=None, help="scrive anche i risultati in questo file")
+    parser.add_argument("--particles", type=int, nargs="*", default=None,
+                        help=f"confronta draw.circle e atlante (default: {' '.join(map(str, PARTICLE_COUNTS))})")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"scenari sconosciuti: {', '.join(sorted(unknown))}")
+
+    pygame.init()
+    pygame.mixer.init()
+    rigori.init_fonts()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    assets = rigori.GameAssets()
+    assets.prefetch()
+    while not assets.ready():
+        time.sleep(0.01)
+
+    if args.particles is not None:
+        particle_benchmark(screen, args.particles or PARTICLE_COUNTS, seed=args.seed)
+        return
+
+    results = {name: run_scenario(name, screen, assets, args.frames, args.warmup, args.seed)
+               for name in args.scenarios or SCENARIOS}
+    pygame.quit()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("scenarios", {})
+    print_results(results, baseline)
+
+    document = {"python": sys.version.split()[0], "pygame": pygame.version.ver,
+                "machine": platform.machine(), "frames": args.frames, "scenarios": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline salvato in {args.baseline}")
+        return
+
+    # Senza baseline non c'è niente da confrontare: un job di CI che ha
+    # dimenticato --save-baseline non deve risultare sempre verde
+    if not os.path.exists(args.baseline):
+        print(f"NESSUN BASELINE in {args.baseline}: salvarlo prima con --save-baseline")
+        sys.exit(2)
+    missing = [name for name in results if name not in baseline]
+    for name in missing:
+        print(f"NESSUN BASELINE per lo scenario {name}")
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, phase, old, new in regressions:
+        print(f"REGRESSIONE {name}/{phase}: {old:.3f} -> {new:.3f}")
+    sys.exit(1 if regressions else 2 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Registrazione delle sessioni senza rallentare il loop: a ogni frame il
+# contenuto dello schermo si copia (una copia di memoria, via surfarray) in
+# uno di pochi buffer NumPy allocati all'avvio, e un thread li codifica in
+# una sequenza di PNG o in un file video grezzo RGB24. Se il thread resta
+# indietro e i buffer sono tutti pieni, con la politica "drop" il frame si
+# salta (e si conta), con "block" il loop aspetta un buffer libero.
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pygame
+
+RING_SIZE = 8
+POLICIES = ("drop", "block")
+PNG_LEVEL = 1            # compressione zlib dei PNG: veloce, file più grandi
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def write_png(path, rows, width, height, level=PNG_LEVEL):
+    # rows: righe RGB già precedute dal byte di filtro (0). Si usa zlib
+    # invece di pygame.image.save perché rilascia il GIL durante la
+    # compressione: il loop principale non si ferma
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE + png_chunk(b"IHDR", header)
+                + png_chunk(b"IDAT", zlib.compress(rows, level)) + png_chunk(b"IEND", b""))
+
+
+class FrameCapture:
+    def __init__(self, path, size, fps, ring_size=RING_SIZE, policy="drop", every=1):
+        if policy not in POLICIES:
+            raise ValueError(f"politica di cattura sconosciuta: {policy}")
+        self.path = path
+        self.width, self.height = size
+        self.fps = fps
+        self.policy = policy
+        self.every = every
+        # .rgb: video grezzo in un solo file; altrimenti cartella di PNG
+        self.raw = path.endswith(".rgb")
+        if self.raw:
+            self.output = open(path, "wb")
+            self.meta_path = path + ".json"
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.output = None
+            self.meta_path = os.path.join(path, "capture.json")
+
+        # Buffer con i pixel a 32 bit così come sono nella superficie
+        self.ring = [np.empty((self.height, self.width), np.uint32) for _ in range(ring_size)]
+        self.free = queue.SimpleQueue()
+        for i in range(ring_size):
+            self.free.put(i)
+        self.filled = queue.SimpleQueue()
+        self.staging = None
+        self.shifts = None
+
+        self.start = time.perf_counter()
+        self.times = []
+        self.frames = 0
+        self.captured = 0
+        self.dropped = 0
+        self.encoded = 0
+        self.blocked = 0.0
+        self.copy_time = 0.0
+        self.encode_time = 0.0
+        self.pending = 0
+        self.max_pending = 0
+        self.bytes = 0
+        self.error = None
+
+        self.thread = threading.Thread(target=self._encode_loop, name="capture", daemon=True)
+        self.thread.start()
+
+    def grab(self, surface):
+        # Nel loop principale, dopo il flip: solo una copia nel buffer libero
+        self.frames += 1
+        if (self.frames - 1) % self.every:
+            return
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            if self.policy == "drop":
+                self.dropped += 1
+                return
+            start = time.perf_counter()
+            index = self.free.get()
+            self.blocked += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if surface.get_bitsize() != 32:
+            # Superficie a 16/24 bit: prima si converte in una a 32 bit
+            if self.staging is None:
+                self.staging = pygame.Surface(surface.get_size(), 0, 32)
+            self.staging.blit(surface, (0, 0))
+            surface = self.staging
+        if self.shifts is None:
+            self.shifts = surface.get_shifts()[:3]
+        # pixels2d è indicizzato (x, y): il trasposto ha le righe in memoria
+        np.copyto(self.ring[index], pygame.surfarray.pixels2d(surface).T)
+        self.copy_time += time.perf_counter() - start
+
+        self.times.append(round(time.perf_counter() - self.start, 4))
+        self.captured += 1
+        self.pending = self.captured - self.encoded
+        self.max_pending = max(self.max_pending, self.pending)
+        self.filled.put(index)
+
+    def _encode_loop(self):
+        if self.raw:
+            rgb = np.empty((self.height, self.width, 3), np.uint8)
+        else:
+            # Ogni riga del PNG inizia con il byte del filtro (0, nessuno)
+            rows = np.zeros((self.height, self.width * 3 + 1), np.uint8)
+            rgb = rows[:, 1:].reshape(self.height, self.width, 3)
+        while True:
+            index = self.filled.get()
+            if index is None:
+                return
+            start = time.perf_counter()
+            pixels = self.ring[index]
+            for channel, shift in enumerate(self.shifts):
+                rgb[:, :, channel] = pixels >> shift
+            self.free.put(index)
+            try:
+                if self.raw:
+                    self.output.write(rgb.data)
+                    self.bytes += rgb.nbytes
+                else:
+                    name = os.path.join(self.path, f"frame_{self.encoded:06d}.png")
+                    write_png(name, rows.data, self.width, self.height)
+                    self.bytes += os.path.getsize(name)
+            except OSError as e:
+                # Disco pieno o simili: si smette di registrare, il gioco continua
+                self.error = str(e)
+                self._drain()
+                return
+            self.encoded += 1
+            self.encode_time += time.perf_counter() - start
+
+    def _drain(self):
+        # Dopo un errore i buffer tornano liberi e i frame si scartano
+        self.policy = "drop"
+        while True:
+            index = self.filled.get()
+            if index is None:
+                return
+            self.dropped += 1
+            self.free.put(index)
+
+    def stats(self):
+        return {"frames": self.frames, "captured": self.captured, "encoded": self.encoded,
+                "dropped": self.dropped, "max_pending": self.max_pending,
+                "blocked_ms": self.blocked * 1000,
+                "copy_ms": self.copy_time / self.captured * 1000 if self.captured else 0.0,
+                "encode_ms": self.encode_time / self.encoded * 1000 if self.encoded else 0.0,
+                "bytes": self.bytes, "error": self.error}
+
+    def report(self):
+        s = self.stats()
+        line = (f"Cattura: {s['encoded']} frame in {self.path}, {s['dropped']} persi, "
+                f"copia {s['copy_ms']:.2f} ms, codifica {s['encode_ms']:.2f} ms, "
+                f"attesa {s['blocked_ms']:.0f} ms, {s['bytes'] / 2 ** 20:.1f} MiB")
+        if s["error"]:
+            line += f" (interrotta: {s['error']})"
+        return line
+
+    def close(self):
+        # Aspetta che i frame in coda siano scritti
+        self.filled.put(None)
+        self.thread.join()
+        if self.output:
+            self.output.close()
+        meta = {"size": [self.width, self.height], "fps": self.fps / self.every,
+                "format": "rgb24" if self.raw else "png", "times": self.times[:self.encoded]}
+        meta.update(self.stats())
+        with open(self.meta_path, "w") as f:
+            json.dump(meta, f)
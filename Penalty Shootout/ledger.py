@@ -0,0 +1,215 @@
+# Registro persistente del saldo: ogni puntata, vincita e penalità si
+# aggiunge in coda a un log (una riga JSON con il suo CRC). Il loop di gioco
+# mette solo le voci in una coda; un thread in background le scrive a gruppi
+# e fa fsync al massimo ogni sync_interval secondi, quindi il rendering non
+# aspetta mai il disco. Ogni snapshot_every voci si salva uno snapshot del
+# saldo con la posizione nel log: all'avvio si rileggono solo le voci
+# successive, e una riga scritta a metà da un crash viene tagliata.
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+
+from rules import STARTING_BALANCE
+
+SYNC_INTERVAL = 0.2
+SNAPSHOT_EVERY = 500
+
+OP_BET = "bet"
+OP_PAYOUT = "payout"
+OP_PENALTY = "penalty"
+
+_STOP = object()
+
+
+def _encode(entry):
+    payload = json.dumps(entry, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode(line):
+    # None se la riga è incompleta o rovinata
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, "rb") as f:
+            snapshot = _decode(f.read())
+    except OSError:
+        return None
+    if not isinstance(snapshot, dict) or not {"seq", "balance", "offset"} <= snapshot.keys():
+        return None
+    return snapshot
+
+
+def recover(path, balance=STARTING_BALANCE):
+    # Restituisce (saldo, ultima sequenza, fine dei dati validi, voci rilette)
+    seq, offset = 0, 0
+    snapshot = _read_snapshot(path + ".snap")
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return balance, seq, offset, 0
+    if snapshot and snapshot["offset"] <= size:
+        balance, seq, offset = snapshot["balance"], snapshot["seq"], snapshot["offset"]
+
+    replayed = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            entry = _decode(line)
+            if entry is None or entry["seq"] != seq + 1:
+                break
+            balance, seq = entry["balance"], entry["seq"]
+            offset += len(line)
+            replayed += 1
+    return balance, seq, offset, replayed
+
+
+class Ledger:
+    def __init__(self, path, sync_interval=SYNC_INTERVAL, snapshot_every=SNAPSHOT_EVERY,
+                 balance=STARTING_BALANCE):
+        self.path = path
+        self.snapshot_path = path + ".snap"
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+
+        start = time.perf_counter()
+        self.balance, self.seq, offset, self.replayed = recover(path, balance)
+        self.recovery_time = time.perf_counter() - start
+
+        self.file = open(path, "ab")
+        if self.file.tell() != offset:
+            # Coda scritta a metà da un crash: si riparte dall'ultima voce valida
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        self.offset = offset
+        self.snapshot_seq = self.seq
+        self.written = 0
+        self.syncs = 0
+        self.durable = None
+        self.error = None
+
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="ledger", daemon=True)
+        self.thread.start()
+
+    def record(self, op, amount, balance):
+        # Chiamato dal loop di gioco: non tocca il disco
+        self.seq += 1
+        self.balance = balance
+        self.queue.put({"seq": self.seq, "op": op, "amount": amount, "balance": balance, "t": time.time()})
+
+    def bet(self, amount, balance):
+        self.record(OP_BET, amount, balance)
+
+    def settle(self, saved, delta, balance):
+        self.record(OP_PENALTY if saved else OP_PAYOUT, abs(delta), balance)
+
+    def _run(self):
+        pending = False
+        last_sync = time.monotonic()
+        stop = False
+        while not stop:
+            timeout = self.sync_interval - (time.monotonic() - last_sync) if pending else None
+            try:
+                item = self.queue.get(timeout=max(timeout, 0) if timeout is not None else None)
+            except queue.Empty:
+                item = None
+
+            # Si svuota la coda e si scrive tutto il gruppo in una volta
+            batch = []
+            while item is not None:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if batch:
+                self._write(batch)
+                pending = True
+
+            if pending and (stop or time.monotonic() - last_sync >= self.sync_interval):
+                self._sync()
+                pending = False
+                last_sync = time.monotonic()
+
+    def _write(self, batch):
+        data = b"".join(_encode(entry) for entry in batch)
+        try:
+            self.file.write(data)
+        except OSError as e:
+            self.error = e
+            print(f"Cannot write ledger {self.path}: {e}")
+            return
+        self.offset += len(data)
+        self.written += len(batch)
+        self.durable = batch[-1]
+
+    def _sync(self):
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            self.error = e
+            print(f"Cannot sync ledger {self.path}: {e}")
+            return
+        self.syncs += 1
+        last = self.durable
+        if last and last["seq"] - self.snapshot_seq >= self.snapshot_every:
+            self._snapshot(last["seq"], last["balance"])
+
+    def _snapshot(self, seq, balance):
+        # Lo snapshot punta solo a dati già sincronizzati sul disco
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_encode({"seq": seq, "balance": balance, "offset": self.offset}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Cannot write ledger snapshot {self.snapshot_path}: {e}")
+            return
+        self.snapshot_seq = seq
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.file.close()
+
+    def stats(self):
+        return {"seq": self.seq, "written": self.written, "syncs": self.syncs,
+                "replayed": self.replayed, "recovery_time": self.recovery_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stato del registro del saldo")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    balance, seq, offset, replayed = recover(args.path)
+    elapsed = time.perf_counter() - start
+    print(f"saldo ${balance}  voci {seq}  byte validi {offset}  "
+          f"rilette {replayed} in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Sistema di particelle su array NumPy preallocati: l'aggiornamento è
+# vettorizzato e le particelle scadute si compattano in un solo passaggio,
+# invece di iterare una copia della lista e chiamare list.remove.
+import numpy as np
+
+FIELDS = ("x", "y", "vx", "vy", "size", "dsize", "alpha", "dalpha", "value")
+
+
+class ParticleSystem:
+    def __init__(self, capacity, gravity=0.0, min_y=None, max_y=None):
+        self.capacity = capacity
+        self.gravity = gravity
+        # Le particelle escono dal sistema oltre questi limiti verticali
+        self.min_y = min_y
+        self.max_y = max_y
+        self.count = 0
+        self.dropped = 0
+
+        for name in FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        self.color = np.zeros(capacity, dtype=np.uint8)
+        self.palette = []
+        self.palette_index = {}
+
+    def __len__(self):
+        return self.count
+
+    def color_index(self, color):
+        index = self.palette_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(color)
+            self.palette_index[color] = index
+        return index
+
+    def emit(self, x, y, color, vx=0.0, vy=0.0, size=1.0, dsize=0.0,
+             alpha=255.0, dalpha=0.0, value=0.0):
+        # Ogni argomento può essere uno scalare o una sequenza (una voce per
+        # particella); color è un colore o una lista di colori
+        values = [np.asarray(v, dtype=np.float64) for v in (x, y, vx, vy, size, dsize, alpha, dalpha, value)]
+        colors = color if isinstance(color, list) else [color]
+        n = max([len(colors)] + [v.size for v in values])
+
+        free = self.capacity - self.count
+        if n > free:
+            # Capacità massima raggiunta: le particelle in eccesso si scartano
+            self.dropped += n - free
+            n = free
+        if n <= 0:
+            return 0
+
+        start, end = self.count, self.count + n
+        for name, v in zip(FIELDS, values):
+            getattr(self, name)[start:end] = v if v.ndim == 0 else v[:n]
+        indexes = [self.color_index(c) for c in colors]
+        self.color[start:end] = indexes[:n] if len(indexes) > 1 else indexes[0]
+        self.count = end
+        return n
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        x, y, vy = self.x[:n], self.y[:n], self.vy[:n]
+        x += self.vx[:n]
+        y += vy
+        vy += self.gravity
+        self.size[:n] += self.dsize[:n]
+        self.alpha[:n] += self.dalpha[:n]
+
+        alive = (self.size[:n] > 0) & (self.alpha[:n] > 0)
+        if self.min_y is not None:
+            alive &= y >= self.min_y
+        if self.max_y is not None:
+            alive &= y <= self.max_y
+        self.compact(alive)
+
+    def compact(self, alive):
+        n = self.count
+        keep = int(np.count_nonzero(alive))
+        if keep == n:
+            return
+        # Compattazione stabile: l'ordine di disegno non cambia
+        for name in FIELDS:
+            arr = getattr(self, name)
+            arr[:keep] = arr[:n][alive]
+        self.color[:keep] = self.color[:n][alive]
+        self.count = keep
+
+    def clear(self):
+        self.count = 0
+
+    def ints(self, name):
+        # Valori troncati come int(), pronti per le chiamate di disegno
+        return getattr(self, name)[:self.count].astype(np.int64).tolist()
+
+    def colors(self):
+        palette = self.palette
+        return [palette[i] for i in self.color[:self.count].tolist()]
@@ -0,0 +1,213 @@
+# Profiler dei frame integrato nel gioco: ogni fase del loop di main()
+# (eventi, gestione input, update, disegno con i suoi sotto-passi, flip) si
+# cronometra con profiler.stage(nome). Tiene i percentili mobili del tempo
+# di frame, conta i frame persi rispetto a FPS e mostra tutto in un overlay
+# (F3). Con stream_path scrive anche una riga JSON di statistiche al secondo.
+# Altre parti del loop (renderer, timestep...) aggiungono i loro contatori
+# con add_source: finiscono nelle stesse statistiche, una riga ciascuna.
+import contextlib
+import json
+import sys
+import time
+from collections import deque
+
+import pygame
+
+from rules import WIDTH, FPS
+
+WINDOW = 600            # frame usati per i percentili mobili
+OVERLAY_REFRESH = 15    # frame tra due aggiornamenti del testo dell'overlay
+TOGGLE_KEY = pygame.K_F3
+OVERLAY_COLUMNS = (6, 150, 205, 260)
+
+# Ordine di visualizzazione; i sotto-passi di draw hanno il prefisso "draw."
+# (draw.targets è compreso in draw.background: i bersagli si disegnano solo
+# quando si rifanno i livelli statici della partita)
+STAGES = ("events", "handle", "update", "draw", "draw.background", "draw.targets",
+          "draw.sprites", "draw.particles", "draw.hud", "draw.win_effects", "flip", "capture")
+# Contatori letti dalla schermata corrente, se li ha
+COUNTED = ("particles", "confetti", "win_effects")
+
+
+def percentiles(samples, qs=(0.50, 0.95, 0.99)):
+    if not samples:
+        return [0.0] * len(qs)
+    ordered = sorted(samples)
+    n = len(ordered)
+    return [ordered[min(n - 1, int(q * n))] for q in qs]
+
+
+def scene_counts(scene):
+    return {name: len(getattr(scene, name)) for name in COUNTED if hasattr(scene, name)}
+
+
+class _Stage:
+    __slots__ = ("times", "name", "start")
+
+    def __init__(self, times, name):
+        self.times = times
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.times[self.name] = self.times.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class NullProfiler:
+    # Stessa interfaccia, nessun costo: per le schermate usate senza main()
+    overlay_rect = None
+    _null = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def draw_overlay(self, surface):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler:
+    def __init__(self, fps=FPS, window=WINDOW, stream_path=None, visible=False):
+        self.budget = 1.0 / fps
+        self.visible = visible
+        self.times = {}
+        self.stages = {}
+        self.history = {}
+        self.frame_times = deque(maxlen=window)
+        self.frames = 0
+        self.dropped = 0
+        self.counts = {}
+        self.last_frame = None
+        # Nome -> funzione che restituisce i contatori di quella parte
+        self.sources = {}
+
+        self.stream = None
+        if stream_path == "-":
+            self.stream = sys.stdout
+        elif stream_path:
+            self.stream = open(stream_path, "a")
+        self.stream_every = fps
+
+        self.font = None
+        self.overlay = None
+        self.overlay_frame = -OVERLAY_REFRESH
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(self.times, name)
+        return stage
+
+    def filter_events(self, events):
+        # Toglie F3 dagli eventi destinati alle schermate; True se l'overlay
+        # è stato mostrato o nascosto
+        toggled = False
+        kept = []
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == TOGGLE_KEY:
+                self.visible = not self.visible
+                toggled = True
+            else:
+                kept.append(event)
+        return kept, toggled
+
+    def add_source(self, name, stats):
+        self.sources[name] = stats
+
+    def set_fps(self, fps):
+        # Il frame rate può cambiare (modalità attrazione dello scheduler)
+        self.budget = 1.0 / fps
+
+    def resume(self):
+        # Dopo un'attesa dell'input: l'intervallo dall'ultimo frame non conta
+        self.last_frame = None
+
+    def end_frame(self, counts=None):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            interval = now - self.last_frame
+            self.frame_times.append(interval)
+            if interval > self.budget * 1.5:
+                # Frame rimasto a schermo più a lungo del previsto: quelli
+                # saltati nel frattempo sono persi
+                self.dropped += int(interval / self.budget + 0.5) - 1
+        self.last_frame = now
+        self.frames += 1
+        self.counts = counts or {}
+
+        for name, elapsed in self.times.items():
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = deque(maxlen=self.frame_times.maxlen)
+            history.append(elapsed)
+        self.times.clear()
+
+        if self.stream and self.frames % self.stream_every == 0:
+            self.write_stats()
+
+    def stats(self):
+        p50, p95, p99 = percentiles(self.frame_times)
+        stages = {}
+        for name in sorted(self.history, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+            s50, s95, s99 = percentiles(self.history[name])
+            stages[name] = {"p50": s50 * 1000, "p95": s95 * 1000, "p99": s99 * 1000}
+        mean = sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+        return {"frames": self.frames, "fps": 1.0 / mean if mean else 0.0,
+                "frame_ms": {"p50": p50 * 1000, "p95": p95 * 1000, "p99": p99 * 1000},
+                "dropped": self.dropped, "stages": stages, "counts": dict(self.counts),
+                "sources": {name: stats() for name, stats in self.sources.items()}}
+
+    def write_stats(self):
+        stats = self.stats()
+        stats["t"] = time.time()
+        self.stream.write(json.dumps(stats, separators=(",", ":")) + "\n")
+        self.stream.flush()
+
+    def lines(self):
+        stats = self.stats()
+        frame = stats["frame_ms"]
+        lines = [f"FPS {stats['fps']:5.1f}  persi {stats['dropped']}",
+                 f"frame p50 {frame['p50']:5.2f}  p95 {frame['p95']:5.2f}  p99 {frame['p99']:5.2f} ms"]
+        # Il tab separa le colonne, allineate in draw_overlay
+        lines.append("fase\tp50\tp95\tp99")
+        for name, s in stats["stages"].items():
+            lines.append(f"{name}\t{s['p50']:.2f}\t{s['p95']:.2f}\t{s['p99']:.2f}")
+        lines.append("  ".join(f"{name} {count}" for name, count in stats["counts"].items()))
+        for name, values in stats["sources"].items():
+            lines.append(f"{name}: " + "  ".join(f"{key} {value:.1f}" if isinstance(value, float)
+                                                 else f"{key} {value}" for key, value in values.items()))
+        return lines
+
+    @property
+    def overlay_rect(self):
+        if not self.visible:
+            return None
+        height = (len(STAGES) + 4 + len(self.sources)) * 16 + 10
+        return pygame.Rect(WIDTH - 330, 10, 320, height)
+
+    def draw_overlay(self, surface):
+        rect = self.overlay_rect
+        if rect is None:
+            return
+        # Il testo cambia a ogni frame: si ricompone solo ogni tanto, con un
+        # font proprio per non svuotare la cache dei testi del gioco
+        if self.overlay is None or self.frames - self.overlay_frame >= OVERLAY_REFRESH:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 20)
+            if self.overlay is None:
+                self.overlay = pygame.Surface(rect.size, pygame.SRCALPHA)
+            self.overlay.fill((0, 0, 0, 170))
+            for i, line in enumerate(self.lines()):
+                for column, cell in zip(OVERLAY_COLUMNS, line.split("\t")):
+                    self.overlay.blit(self.font.render(cell, True, (255, 255, 255)), (column, 5 + i * 16))
+            self.overlay_frame = self.frames
+        surface.blit(self.overlay, rect)
+
+    def close(self):
+        if self.stream and self.stream is not sys.stdout:
+            self.stream.close()
@@ -0,0 +1,184 @@
+# Scala di rendering interna: con una scala minore di 1 tutte le superfici
+# del gioco (schermo, livelli, sprite, scritte, immagini) hanno meno pixel,
+# ma le schermate continuano a lavorare con le coordinate logiche WIDTH x
+# HEIGHT. ScaledSurface fa da tramite: ha le dimensioni logiche e converte
+# posizioni, aree e spessori nei pixel della superficie vera; draw_rect,
+# draw_circle e draw_line fanno lo stesso al posto di pygame.draw. Con la
+# scala 1 non si crea nessun tramite e tutto resta com'era.
+import math
+
+import pygame
+
+scale = 1.0
+
+
+def set_scale(value):
+    # True se la scala è cambiata: le superfici in cache vanno rifatte
+    global scale
+    changed = value != scale
+    scale = value
+    return changed
+
+
+def pixels(size, factor=None):
+    # Dimensione in pixel veri di una dimensione logica (almeno 1)
+    factor = scale if factor is None else factor
+    return (max(1, round(size[0] * factor)), max(1, round(size[1] * factor)))
+
+
+class PixelBlits:
+    # Voci per blits già in pixel veri (le particelle dell'atlante,
+    # convertite con NumPy): ScaledSurface.blits le passa così come sono
+    def __init__(self, entries):
+        self.entries = entries
+
+
+class ScaledSurface:
+    def __init__(self, surface, factor, size=None):
+        self.surface = surface
+        self.scale = factor
+        if size is None:
+            width, height = surface.get_size()
+            size = (max(1, round(width / factor)), max(1, round(height / factor)))
+        self.size = tuple(size)
+
+    def get_size(self):
+        return self.size
+
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    # Da coordinate logiche a pixel veri: i bordi si arrotondano uno per
+    # uno, così rettangoli adiacenti restano adiacenti anche dopo la scala
+
+    def point(self, pos):
+        return (round(pos[0] * self.scale), round(pos[1] * self.scale))
+
+    def area(self, rect):
+        rect = pygame.Rect(rect)
+        s = self.scale
+        left, top = round(rect.left * s), round(rect.top * s)
+        return pygame.Rect(left, top, round(rect.right * s) - left, round(rect.bottom * s) - top)
+
+    def bounds(self, rect):
+        # Tutti i pixel che un disegno dentro rect può toccare, con un pixel
+        # di margine per gli arrotondamenti: per il clip e per gli update
+        rect = pygame.Rect(rect)
+        s = self.scale
+        left, top = math.floor(rect.left * s) - 1, math.floor(rect.top * s) - 1
+        right, bottom = math.ceil(rect.right * s) + 1, math.ceil(rect.bottom * s) + 1
+        return pygame.Rect(left, top, right - left, bottom - top).clip(self.surface.get_rect())
+
+    def source(self, source, area):
+        if isinstance(source, ScaledSurface):
+            return source.surface, None if area is None else source.area(area)
+        # Superficie non scalata (l'overlay del profiler): si scala al volo
+        if area is not None:
+            source = source.subsurface(pygame.Rect(area).clip(source.get_rect()))
+        return pygame.transform.scale(source, pixels(source.get_size(), self.scale)), None
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        source, area = self.source(source, area)
+        return self.surface.blit(source, self.point(dest), area, special_flags)
+
+    def blits(self, blit_sequence, doreturn=True):
+        if isinstance(blit_sequence, PixelBlits):
+            return self.surface.blits(blit_sequence.entries, doreturn)
+        # Le aree dell'atlante si ripetono: ognuna si converte una volta sola
+        point = self.point
+        areas = {}
+        sequence = []
+        for entry in blit_sequence:
+            source, dest = entry[0], entry[1]
+            area = entry[2] if len(entry) > 2 else None
+            if area is None or not isinstance(source, ScaledSurface):
+                source, area = self.source(source, area)
+            else:
+                cached = areas.get(id(area))
+                if cached is None or cached[0] is not area:
+                    cached = areas[id(area)] = (area, source.area(area))
+                source, area = source.surface, cached[1]
+            sequence.append((source, point(dest), area) + tuple(entry[3:]))
+        return self.surface.blits(sequence, doreturn)
+
+    def fill(self, color, rect=None, special_flags=0):
+        return self.surface.fill(color, None if rect is None else self.area(rect), special_flags)
+
+    def set_clip(self, rect):
+        self.surface.set_clip(None if rect is None else self.bounds(rect))
+
+    def get_clip(self):
+        # Il rettangolo logico che contiene tutto il clip vero
+        clip = self.surface.get_clip()
+        s = self.scale
+        left, top = math.floor(clip.left / s), math.floor(clip.top / s)
+        return pygame.Rect(left, top, math.ceil(clip.right / s) - left, math.ceil(clip.bottom / s) - top)
+
+    def subsurface(self, rect):
+        rect = pygame.Rect(rect)
+        return ScaledSurface(self.surface.subsurface(self.area(rect)), self.scale, rect.size)
+
+    def set_colorkey(self, *args):
+        self.surface.set_colorkey(*args)
+
+    def set_alpha(self, *args):
+        self.surface.set_alpha(*args)
+
+    def get_alpha(self):
+        return self.surface.get_alpha()
+
+
+def wrap(surface):
+    # Superficie già a pixel veri (es. una scritta del font scalato)
+    return surface if scale == 1 else ScaledSurface(surface, scale)
+
+
+def prescale(surface):
+    # Immagine caricata a dimensione logica: si riduce una volta sola e
+    # mantiene la dimensione logica esatta (le collisioni non cambiano)
+    if scale == 1 or isinstance(surface, ScaledSurface):
+        return surface
+    return ScaledSurface(pygame.transform.smoothscale(surface, pixels(surface.get_size())),
+                         scale, surface.get_size())
+
+
+def font_size(size):
+    return max(1, round(size * scale))
+
+
+# Come pygame.draw, anche su una ScaledSurface
+
+def _width(width, s):
+    return max(1, round(width * s)) if width > 0 else width
+
+
+def draw_rect(surface, color, rect, width=0, border_radius=0):
+    if not isinstance(surface, ScaledSurface):
+        return pygame.draw.rect(surface, color, rect, width, border_radius)
+    s = surface.scale
+    return pygame.draw.rect(surface.surface, color, surface.area(rect), _width(width, s),
+                            round(border_radius * s))
+
+
+def draw_circle(surface, color, center, radius, width=0):
+    if not isinstance(surface, ScaledSurface):
+        return pygame.draw.circle(surface, color, center, radius, width)
+    s = surface.scale
+    radius = max(1, round(radius * s)) if radius >= 1 else 0
+    return pygame.draw.circle(surface.surface, color, surface.point(center), radius, _width(width, s))
+
+
+def draw_line(surface, color, start, end, width=1):
+    if not isinstance(surface, ScaledSurface):
+        return pygame.draw.line(surface, color, start, end, width)
+    return pygame.draw.line(surface.surface, color, surface.point(start), surface.point(end),
+                            _width(width, surface.scale))
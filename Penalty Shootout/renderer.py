@@ -0,0 +1,117 @@
+# Rendering a rettangoli sporchi (opzionale): ogni schermata riporta le
+# zone cambiate dall'ultimo frame e solo quelle vengono ridisegnate e
+# inviate al display con pygame.display.update(rects).
+import pygame
+
+from profiler import NULL_PROFILER
+
+
+class DirtyTracker:
+    # Confronta lo stato statico della schermata (testi, saldo, hover...) e
+    # gli oggetti in movimento con quelli del frame precedente. Ogni oggetto
+    # è (x, y, w, h, *aspetto): colore o alpha fanno parte del confronto,
+    # così un oggetto diverso nello stesso rettangolo viene ridisegnato.
+    def __init__(self):
+        self.state = None
+        self.items = set()
+
+    def update(self, state, items):
+        items = {tuple(i) for i in items}
+        if state != self.state:
+            # Cambiato qualcosa di statico: serve un ridisegno completo
+            self.state = state
+            self.items = items
+            return None
+
+        # Da ripulire le vecchie posizioni, da disegnare le nuove
+        dirty = (self.items - items) | (items - self.items)
+        self.items = items
+        return [pygame.Rect(i[:4]) for i in dirty]
+
+    def invalidate(self):
+        self.state = None
+
+
+def circle_rect(x, y, radius):
+    # Con un pixel di margine attorno al cerchio
+    radius = int(radius) + 1
+    return (int(x) - radius, int(y) - radius, radius * 2 + 1, radius * 2 + 1)
+
+
+class DirtyRenderer:
+    def __init__(self, surface, enabled=False, profiler=NULL_PROFILER, display=pygame.display):
+        self.surface = surface
+        self.enabled = enabled
+        # Chi porta il frame a schermo: pygame.display o un Viewport scalato
+        self.display = display
+        # Cronometra disegno e flip e aggiunge il suo overlay sopra la schermata
+        self.profiler = profiler
+        self.scene = None
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.idle_frames = 0
+
+    def present(self, scene, draw):
+        # draw(surface) disegna la schermata completa; con il clip attivo
+        # pygame rasterizza solo dentro la zona sporca
+        if not self.enabled:
+            self.draw(draw)
+            self.flip()
+            self.full_frames += 1
+            return
+
+        rects = scene.dirty_rects()
+        if scene is not self.scene:
+            # Cambio di schermata: sempre flip completo
+            self.scene = scene
+            rects = None
+
+        overlay = self.profiler.overlay_rect
+        if overlay and rects is not None:
+            # L'overlay del profiler cambia a ogni aggiornamento
+            rects.append(overlay)
+
+        if rects is None:
+            self.draw(draw)
+            self.flip()
+            self.full_frames += 1
+        elif rects:
+            bounds = self.surface.get_rect()
+            rects = [r.clip(bounds) for r in rects]
+            clip = rects[0].unionall(rects[1:])
+            # pygame sbaglia i bordi dei rettangoli (width > 0) tagliati dal
+            # clip: i pulsanti toccati dalla zona sporca si ridisegnano interi.
+            # Con la scala di rendering il clip vero ha qualche pixel in più
+            # (get_clip lo riporta in coordinate logiche)
+            self.surface.set_clip(clip)
+            touched = self.surface.get_clip()
+            for whole in scene.whole_rects():
+                if touched.colliderect(whole):
+                    clip.union_ip(whole)
+                    rects.append(whole)
+            self.surface.set_clip(clip)
+            self.draw(draw)
+            self.surface.set_clip(None)
+            self.flip(rects)
+            self.partial_frames += 1
+        else:
+            self.idle_frames += 1
+
+    def draw(self, draw):
+        with self.profiler.stage("draw"):
+            draw(self.surface)
+            self.profiler.draw_overlay(self.surface)
+
+    def flip(self, rects=None):
+        with self.profiler.stage("flip"):
+            if rects is None:
+                self.display.flip()
+            else:
+                self.display.update(rects)
+
+    def stats(self):
+        # Frame ridisegnati per intero, solo nelle zone sporche, o saltati
+        return {"full": self.full_frames, "partial": self.partial_frames, "idle": self.idle_frames}
+
+    def invalidate(self):
+        self.scene = None
@@ -0,0 +1,185 @@
+# Log binario compatto di una sessione e verifica headless.
+#
+# Il file contiene il seed, il saldo iniziale e la sequenza di azioni del
+# giocatore: fiche puntate (nell'ordine dei clic, scritte quando si punta o
+# si torna indietro), inizio partita (con le dimensioni degli sprite, da cui
+# dipende la tabella degli esiti), tiri con il bersaglio scelto, ritiri e
+# ritorni al menu. Con lo stesso seed GameRNG.outcome produce gli stessi
+# tuffi, quindi la sessione si ricalcola con le sole regole, senza pygame e
+# alla velocità della CPU.
+# CASH_OUT, MENU ed END riportano il saldo visto dal gioco, che la verifica
+# confronta con quello ricalcolato.
+import argparse
+import struct
+import sys
+from multiprocessing import Pool
+
+from rules import (CHIP_VALUES, GameRNG, choose_dive, outcome_table, place_bet,
+                   cancel_bet, settle_shot)
+
+MAGIC = b"PSRP"
+VERSION = 1
+# magic, versione, seed (senza segno), saldo iniziale
+HEADER = struct.Struct("<4sBQq")
+
+OP_CHIP = 1      # + indice fiche (B)
+OP_CANCEL = 2    # pulsante INDIETRO
+OP_START = 3     # + palla (w, h) e portiere (w, h) (HHHH), pulsante PUNTA
+OP_SHOT = 4      # + indice bersaglio (B)
+OP_CASH_OUT = 5  # + saldo (q)
+OP_MENU = 6      # + saldo (q), ritorno al menu dopo il game over
+OP_END = 7       # + saldo (q), chiusura del gioco
+
+_PAYLOAD = {
+    OP_CHIP: struct.Struct("<B"),
+    OP_START: struct.Struct("<HHHH"),
+    OP_SHOT: struct.Struct("<B"),
+    OP_CASH_OUT: struct.Struct("<q"),
+    OP_MENU: struct.Struct("<q"),
+    OP_END: struct.Struct("<q"),
+}
+
+
+class ReplayError(Exception):
+    pass
+
+
+class ReplayRecorder:
+    def __init__(self, path, seed, balance):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, balance))
+
+    def _write(self, op, *values):
+        self.file.write(bytes((op,)))
+        if op in _PAYLOAD:
+            self.file.write(_PAYLOAD[op].pack(*values))
+
+    def chip(self, index):
+        self._write(OP_CHIP, index)
+
+    def cancel(self):
+        self._write(OP_CANCEL)
+
+    def start(self, ball_size, keeper_size):
+        self._write(OP_START, *ball_size, *keeper_size)
+
+    def shot(self, target):
+        self._write(OP_SHOT, target)
+
+    def cash_out(self, balance):
+        self._write(OP_CASH_OUT, balance)
+
+    def menu(self, balance):
+        self._write(OP_MENU, balance)
+
+    def close(self, balance):
+        if not self.file.closed:
+            self._write(OP_END, balance)
+            self.file.close()
+
+
+def read_replay(data):
+    if len(data) < HEADER.size:
+        raise ReplayError("file troppo corto")
+    magic, version, seed, balance = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ReplayError("formato di replay non riconosciuto")
+
+    actions = []
+    pos = HEADER.size
+    while pos < len(data):
+        op = data[pos]
+        pos += 1
+        payload = _PAYLOAD.get(op)
+        if payload is None:
+            if op != OP_CANCEL:
+                raise ReplayError(f"azione sconosciuta {op} al byte {pos - 1}")
+            actions.append((op, None))
+            continue
+        if pos + payload.size > len(data):
+            raise ReplayError("file troncato")
+        values = payload.unpack_from(data, pos)
+        actions.append((op, values if len(values) > 1 else values[0]))
+        pos += payload.size
+    return {"seed": seed, "balance": balance, "actions": actions}
+
+
+def replay_session(path):
+    # Rigioca la sessione con le stesse transizioni di main()
+    with open(path, "rb") as f:
+        log = read_replay(f.read())
+
+    rng = GameRNG(log["seed"])
+    outcomes = None
+    balance = log["balance"]
+    betting_balance, current_bet = balance, 0
+    game_balance = game_bet = None
+    result = {"path": path, "shots": 0, "goals": 0, "saves": 0, "mismatches": []}
+
+    def check(op, recorded, computed):
+        if recorded != computed:
+            result["mismatches"].append((op, recorded, computed))
+
+    for op, value in log["actions"]:
+        if op == OP_CHIP:
+            bet = place_bet(betting_balance, current_bet, CHIP_VALUES[value])
+            if bet:
+                betting_balance, current_bet = bet
+        elif op == OP_CANCEL:
+            betting_balance, current_bet = cancel_bet(betting_balance, current_bet)
+        elif op == OP_START:
+            outcomes = outcome_table(value[:2], value[2:])
+            game_balance, game_bet = betting_balance, current_bet
+        elif op == OP_SHOT:
+            if game_balance is None:
+                raise ReplayError("tiro fuori da una partita")
+            saved = outcomes[value][choose_dive(rng.outcome)]
+            game_balance, _, _ = settle_shot(game_balance, game_bet, saved)
+            result["shots"] += 1
+            result["saves" if saved else "goals"] += 1
+        elif op in (OP_CASH_OUT, OP_MENU):
+            balance = game_balance
+            check(op, value, balance)
+            betting_balance, current_bet = balance, 0
+            game_balance = game_bet = None
+        elif op == OP_END:
+            check(op, value, balance if game_balance is None else game_balance)
+
+    result["balance"] = balance if game_balance is None else game_balance
+    result["ok"] = not result["mismatches"]
+    return result
+
+
+def _verify(path):
+    try:
+        return replay_session(path)
+    except (OSError, ReplayError) as e:
+        return {"path": path, "ok": False, "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica headless dei replay delle sessioni")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            results = pool.map(_verify, args.paths, chunksize=64)
+    else:
+        results = map(_verify, args.paths)
+
+    failed = 0
+    for r in results:
+        if "error" in r:
+            print(f"{r['path']}: ERRORE {r['error']}")
+        else:
+            status = "OK" if r["ok"] else f"DIVERSO {r['mismatches']}"
+            print(f"{r['path']}: {status}  tiri {r['shots']}  gol {r['goals']}  "
+                  f"parate {r['saves']}  saldo ${r['balance']}")
+        failed += not r["ok"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,30 @@
 import pygame
 import sys
-import random
 import math
+import threading
 from pygame import gfxdraw
 
-pygame.init()
-pygame.mixer.init()
+from asset_pipeline import decode_image, convert_image, load_sound
+from render_scale import draw_rect, draw_circle, draw_line, prescale, font_size, set_scale
+from text_cache import render_text, text_cache
+from renderer import DirtyRenderer, DirtyTracker, circle_rect
+from particles import ParticleSystem
+from atlas import atlas
+from sprites import new_surface, target_sprite, overlay_sprite, layer_surface, clear_sprites, TARGET_RADIUS
+from timestep import FixedTimestep
+from replay import ReplayRecorder
+from profiler import FrameProfiler, NULL_PROFILER, scene_counts
+from scheduler import IdleScheduler
+from ledger import Ledger, SYNC_INTERVAL
+from viewport import Viewport
+from capture import FrameCapture, POLICIES, RING_SIZE
 
-# Costanti del gioco
-WIDTH, HEIGHT = 800, 600
-FPS = 60
-GOAL_WIDTH = 500
-GOAL_HEIGHT = 300
+# Costanti e regole del gioco (senza pygame)
+from rules import WIDTH, HEIGHT, FPS, GOAL_WIDTH, GOAL_HEIGHT
+from rules import TARGET_POSITIONS, BALL_START, KEEPER_START, BALL_SPEED, ball_step, keeper_step
+from rules import (DIVE_STAY, CHIP_VALUES, STARTING_BALANCE, GOAL_MULTIPLIER,
+                   PENALTY_MULTIPLIER, outcome_table, choose_dive, dive_target,
+                   place_bet, cancel_bet, settle_shot, GameRNG)
 
 # Colori
 WHITE = (255, 255, 255)
@@ -24,46 +37,148 @@ GREEN = (0, 128, 0)
 PURPLE = (128, 0, 255)
 CHIPS_COLORS = [(255, 50, 50), (50, 50, 255), (50, 255, 50), (255, 255, 50), (255, 50, 255)]
 
-# Font
-font = pygame.font.SysFont("Arial", 24)
-big_font = pygame.font.SysFont("Arial", 48)
-title_font = pygame.font.SysFont("Arial", 64, bold=True)
-money_font = pygame.font.SysFont("Arial", 32, bold=True)
+# Capacità massima dei sistemi di particelle
+MENU_PARTICLES = 512
+TRAIL_PARTICLES = 1024
+CONFETTI_PARTICLES = 4096
+WIN_EFFECTS = 64
+
+# Pila delle fiche puntate: altezza massima e passo verticale
+MAX_STACK_CHIPS = 20
+CHIP_STACK_STEP = 5
+CHIP_STACK_KEY = (255, 0, 255)
+
+# Font, creati da init_fonts() dopo pygame.init() alla scala di rendering
+font = None
+big_font = None
+title_font = None
+money_font = None
+
+def init_fonts():
+    global font, big_font, title_font, money_font
+    font = pygame.font.SysFont("Arial", font_size(24))
+    big_font = pygame.font.SysFont("Arial", font_size(48))
+    title_font = pygame.font.SysFont("Arial", font_size(64), bold=True)
+    money_font = pygame.font.SysFont("Arial", font_size(32), bold=True)
+
+# Immagini: nome -> (size, scale, alpha)
+GAME_IMAGES = {
+    "background": ((WIDTH, HEIGHT), None, False),
+    "ball": (None, 0.15, True),
+    "keeper": (None, 0.6, True),
+    "chip": (None, 0.1, True),
+}
+GAME_SOUNDS = ("kick", "goal", "save", "coin", "win", "lose")
+# Asset che servono alla partita, nell'ordine in cui il thread li precarica
+# (coin_sound serve già nella schermata delle puntate)
+PREFETCH_ASSETS = ("coin_sound", "background", "ball", "keeper", "kick_sound",
+                   "goal_sound", "save_sound", "win_sound", "lose_sound")
 
 class GameAssets:
+    # Ogni asset si carica al primo accesso (ball, keeper, kick_sound...);
+    # prefetch() li prepara in un thread mentre il menu è già a schermo
     def __init__(self):
-        self.background = self._load_image("background", (WIDTH, HEIGHT))
-        self.ball = self._load_image("ball", None, 0.15)
-        self.keeper = self._load_image("keeper", None, 0.6)
-        self.chip = self._load_image("chip", None, 0.1)
-        
-        self.kick_sound = self._load_sound("kick")
-        self.goal_sound = self._load_sound("goal")
-        self.save_sound = self._load_sound("save")
-        self.coin_sound = self._load_sound("coin")
-        self.win_sound = self._load_sound("win")
-        self.lose_sound = self._load_sound("lose")
-        
-    def _load_image(self, name, size=None, scale=None):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._prefetched = {}
+        self._thread = None
+    
+    def __getattr__(self, name):
+        # Chiamato solo per gli asset non ancora caricati
+        if name.startswith("_") or not self._is_asset(name):
+            raise AttributeError(name)
+        
+        with self._lock:
+            event = self._pending.get(name)
+        if event is not None:
+            # Il thread lo sta già caricando: meglio aspettare che rifarlo
+            event.wait()
+        with self._lock:
+            self._pending.pop(name, None)
+            raw = self._prefetched.pop(name, None)
+        
+        if name.endswith("_sound"):
+            value = self._load_sound(name[:-len("_sound")], raw)
+        else:
+            value = self._load_image(name, raw)
+        setattr(self, name, value)
+        return value
+    
+    @staticmethod
+    def _is_asset(name):
+        return name in GAME_IMAGES or (name.endswith("_sound") and name[:-len("_sound")] in GAME_SOUNDS)
+    
+    def prefetch(self, names=PREFETCH_ASSETS):
+        names = [n for n in names if n not in self.__dict__]
+        with self._lock:
+            names = [n for n in names if n not in self._pending]
+            for name in names:
+                self._pending[name] = threading.Event()
+        if names:
+            self._thread = threading.Thread(target=self._prefetch, args=(names,), daemon=True)
+            self._thread.start()
+    
+    def _prefetch(self, names):
+        for name in names:
+            # Qualunque errore si conserva e si rilancia al primo accesso,
+            # come se l'asset si caricasse lì: l'evento va segnalato comunque,
+            # altrimenti ready() e __getattr__ aspetterebbero per sempre
+            raw = None
+            try:
+                if name.endswith("_sound"):
+                    raw = load_sound(name[:-len("_sound")])
+                else:
+                    size, scale, alpha = GAME_IMAGES[name]
+                    raw = decode_image(name, size, scale, alpha)
+            except Exception as e:
+                raw = e
+            finally:
+                with self._lock:
+                    self._prefetched[name] = raw
+                    event = self._pending.get(name)
+                if event is not None:
+                    event.set()
+    
+    def ready(self, names=PREFETCH_ASSETS):
+        # Controllo non bloccante: True se gli asset sono già utilizzabili
+        with self._lock:
+            return all(name not in self._pending or self._pending[name].is_set() for name in names)
+    
+    def _load_image(self, name, raw=None):
+        size, scale, alpha = GAME_IMAGES[name]
         try:
-            img = pygame.image.load(f"{name}.png").convert_alpha()
-            if scale:
-                img = pygame.transform.smoothscale(img, (int(img.get_width() * scale), (int(img.get_height() * scale))))
-            elif size:
-                img = pygame.transform.smoothscale(img, size)
-            return img
-        except:
+            if raw is None:
+                raw = decode_image(name, size, scale, alpha)
+            if isinstance(raw, Exception):
+                raise raw
+            img = None if raw is None else convert_image(raw, alpha)
+        except (pygame.error, OSError) as e:
+            print(f"Image {name} cannot be loaded ({e})")
+            img = None
+        if img is None:
             print(f"Image {name} not found, creating placeholder")
-            surf = pygame.Surface((100, 100), pygame.SRCALPHA)
-            pygame.draw.circle(surf, RED if name == "ball" else BLUE, (50, 50), 50)
-            return surf
+            img = new_surface((100, 100), pygame.SRCALPHA)
+            draw_circle(img, RED if name == "ball" else BLUE, (50, 50), 50)
+        # Alla scala di rendering, con la stessa dimensione logica
+        return prescale(img)
+    
+    def shot_outcomes(self):
+        # Ricostruita automaticamente se cambiano gli sprite o la porta
+        return outcome_table(self.ball.get_size(), self.keeper.get_size())
     
-    def _load_sound(self, name):
+    def _load_sound(self, name, sound=None):
         try:
-            return pygame.mixer.Sound(f"{name}.wav")
-        except:
+            if sound is None:
+                sound = load_sound(name)
+            if isinstance(sound, Exception):
+                raise sound
+        except (pygame.error, OSError) as e:
+            print(f"Sound {name} cannot be loaded ({e})")
+            sound = None
+        if sound is None:
             print(f"Sound {name} not found, using silent sound")
-            return pygame.mixer.Sound(buffer=bytearray(100))
+            sound = pygame.mixer.Sound(buffer=bytearray(100))
+        return sound
 
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, text_color=WHITE, border_color=WHITE):
@@ -74,16 +189,27 @@ class Button:
         self.text_color = text_color
         self.border_color = border_color
         self.is_hovered = False
+        self.sprites = {}
     
-    def draw(self, surface):
+    def draw(self, surface, rect=None):
+        rect = rect or self.rect
         color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, self.border_color, self.rect, 2, border_radius=10)
+        draw_rect(surface, color, rect, border_radius=10)
+        draw_rect(surface, self.border_color, rect, 2, border_radius=10)
         
-        text_surf = font.render(self.text, True, self.text_color)
-        text_rect = text_surf.get_rect(center=self.rect.center)
+        text_surf = render_text(font, self.text, self.text_color)
+        text_rect = text_surf.get_rect(center=rect.center)
         surface.blit(text_surf, text_rect)
     
+    def sprite(self):
+        # Il pulsante già disegnato su una superficie trasparente, una per
+        # stato di hover
+        surf = self.sprites.get(self.is_hovered)
+        if surf is None:
+            surf = self.sprites[self.is_hovered] = new_surface(self.rect.size, pygame.SRCALPHA)
+            self.draw(surf, surf.get_rect())
+        return surf
+    
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
         return self.is_hovered
@@ -106,62 +232,146 @@ class Chip:
     def draw(self, surface, assets):
         color = CHIPS_COLORS[self.color_index % len(CHIPS_COLORS)]
         
-        pygame.draw.circle(surface, (50, 50, 50), (self.x, self.y + 5), self.radius)
-        pygame.draw.circle(surface, color, (self.x, self.y), self.radius)
-        pygame.draw.circle(surface, WHITE, (self.x, self.y), self.radius, 2)
-        pygame.draw.circle(surface, (255, 255, 255, 100), (self.x-10, self.y-10), 10)
+        draw_circle(surface, (50, 50, 50), (self.x, self.y + 5), self.radius)
+        draw_circle(surface, color, (self.x, self.y), self.radius)
+        draw_circle(surface, WHITE, (self.x, self.y), self.radius, 2)
+        draw_circle(surface, (255, 255, 255, 100), (self.x-10, self.y-10), 10)
         
-        text = font.render(str(self.value), True, WHITE)
+        text = render_text(font, str(self.value), WHITE)
         text_rect = text.get_rect(center=(self.x, self.y))
         surface.blit(text, text_rect)
         
         if self.is_selected:
-            pygame.draw.circle(surface, GOLD, (self.x, self.y), self.radius + 5, 3)
+            draw_circle(surface, GOLD, (self.x, self.y), self.radius + 5, 3)
+    
+    def sprite(self, like=None):
+        # La fiche disegnata una volta nell'atlante, come voce per Surface.blits
+        margin = self.radius + 5
+        def build(surf):
+            chip = Chip(margin, margin, self.value, self.color_index)
+            chip.is_selected = self.is_selected
+            chip.draw(surf, None)
+        key = ("chip", self.value, self.color_index, self.is_selected)
+        area = atlas.sprite(key, (margin * 2 + 1, margin * 2 + 1), build, like)
+        return atlas.surface, (self.x - margin, self.y - margin), area
     
     def check_click(self, pos):
         distance = math.hypot(pos[0] - self.x, pos[1] - self.y)
         return distance <= self.radius
 
+class ChipStack:
+    # Pila delle fiche puntate: conta solo quante fiche ci sono per taglio e
+    # la disegna in una superficie riusata, rifatta solo quando la puntata
+    # cambia. Oltre max_visible fiche l'altezza non cresce più.
+    def __init__(self, x, y, max_visible=MAX_STACK_CHIPS):
+        self.x = x
+        self.y = y
+        self.max_visible = max_visible
+        self.counts = [0] * len(CHIP_VALUES)
+        # Raggio della fiche più l'anello dorato
+        self.margin = 35
+        self.surface = None
+        self.drawn = None
+        self.area = None
+    
+    def __len__(self):
+        return sum(self.counts)
+    
+    def add(self, color_index):
+        self.counts[color_index] += 1
+    
+    def visible_counts(self):
+        # Fiche disegnate per taglio: proporzionali se sono troppe, ma almeno
+        # una per ogni taglio puntato
+        total = len(self)
+        if total <= self.max_visible:
+            return list(self.counts)
+        return [min(c, max(1, c * self.max_visible // total)) if c else 0 for c in self.counts]
+    
+    def render(self):
+        if self.surface is None:
+            # Superficie opaca con colorkey: i cerchi si disegnano come sullo
+            # schermo, senza fondere l'alpha dei colori
+            height = (self.max_visible + len(CHIP_VALUES) - 1) * CHIP_STACK_STEP + self.margin * 2 + 1
+            self.surface = new_surface((self.margin * 2 + 1, height))
+            self.surface.set_colorkey(CHIP_STACK_KEY)
+        
+        counts = tuple(self.counts)
+        if counts != self.drawn:
+            self.drawn = counts
+            self.surface.fill(CHIP_STACK_KEY)
+            # Le fiche grandi in basso; ogni fiche copre quella sotto
+            visible = self.visible_counts()
+            order = [i for i in reversed(range(len(CHIP_VALUES))) for _ in range(visible[i])]
+            bottom = self.surface.get_height() - self.margin - 1
+            for i, color_index in enumerate(order):
+                chip = Chip(self.margin, bottom - i * CHIP_STACK_STEP, CHIP_VALUES[color_index], color_index)
+                chip.is_selected = True
+                chip.draw(self.surface, None)
+            top = bottom - self.margin - (len(order) - 1) * CHIP_STACK_STEP
+            self.area = pygame.Rect(0, top, self.surface.get_width(), self.surface.get_height() - top)
+        return self.surface, self.area
+    
+    def draw(self, surface):
+        if not len(self):
+            return
+        stack, area = self.render()
+        # La fiche in basso ha il centro in (x, y)
+        top = self.y + self.margin + 1 - area.height
+        surface.blit(stack, (self.x - self.margin, top), area)
+        if len(self) > self.max_visible:
+            label = render_text(font, f"{len(self)} fiche", WHITE)
+            surface.blit(label, label.get_rect(midbottom=(self.x, top)))
+
 class MainMenu:
-    def __init__(self):
-        self.title = title_font.render("Ultimate Penalty Casino", True, GOLD)
+    def __init__(self, rng=None):
+        self.rng = rng or GameRNG()
+        self.title = render_text(title_font, "Ultimate Penalty Casino", GOLD)
         self.title_rect = self.title.get_rect(center=(WIDTH//2, HEIGHT//4))
         
-        self.subtitle = font.render("Scommetti e segna per vincere!", True, WHITE)
+        self.subtitle = render_text(font, "Scommetti e segna per vincere!", WHITE)
         self.subtitle_rect = self.subtitle.get_rect(center=(WIDTH//2, HEIGHT//4 + 70))
         
         self.play_button = Button(WIDTH//2 - 150, HEIGHT//2, 300, 60, 
                                 "GIOCA", GREEN, (0, 200, 0), BLACK, GOLD)
         self.exit_button = Button(WIDTH//2 - 150, HEIGHT//2 + 100, 300, 60, 
                                  "ESCI", RED, (200, 0, 0), WHITE, GOLD)
-        self.particles = []
+        self.particles = ParticleSystem(MENU_PARTICLES, min_y=0)
+        self.background = None
+        self.dirty = DirtyTracker()
     
     def add_particle(self):
-        x = random.randint(0, WIDTH)
+        rng = self.rng.cosmetic
+        x = rng.randint(0, WIDTH)
         y = HEIGHT
-        speed = random.uniform(2, 5)
-        size = random.randint(2, 5)
-        color = random.choice([GOLD, RED, GREEN, BLUE, PURPLE])
-        self.particles.append([x, y, speed, size, color])
+        speed = rng.uniform(2, 5)
+        size = rng.randint(2, 5)
+        color = rng.choice([GOLD, RED, GREEN, BLUE, PURPLE])
+        self.particles.emit(x, y, color, vy=-speed, size=size)
     
     def update_particles(self):
-        for p in self.particles[:]:
-            p[1] -= p[2]
-            if p[1] < 0:
-                self.particles.remove(p)
+        self.particles.update()
         
-        if random.random() < 0.1:
+        if self.rng.cosmetic.random() < 0.1:
             self.add_particle()
     
     def draw_particles(self, surface):
-        for p in self.particles:
-            pygame.draw.circle(surface, p[4], (int(p[0]), int(p[1])), p[3])
+        # Un solo blits per tutte le particelle, dai cerchi dell'atlante
+        surface.blits(atlas.particle_blits(self.particles, surface), doreturn=False)
+    
+    def get_background(self, surface):
+        # Sfondo con effetto gradiente, disegnato una volta sola e ricreato
+        # solo se cambia la dimensione della finestra
+        size = surface.get_size()
+        if self.background is None or self.background.get_size() != size:
+            self.background = new_surface(size, 0, surface)
+            for y in range(size[1]):
+                color = (0, max(0, min(50, y//12)), 0)
+                draw_line(self.background, color, (0, y), (size[0], y))
+        return self.background
     
     def draw(self, surface):
-        # Sfondo con effetto gradiente
-        for y in range(HEIGHT):
-            color = (0, max(0, min(50, y//12)), 0)
-            pygame.draw.line(surface, color, (0, y), (WIDTH, y))
+        surface.blit(self.get_background(surface), (0, 0))
         
         self.draw_particles(surface)
         surface.blit(self.title, self.title_rect)
@@ -170,37 +380,55 @@ class MainMenu:
         self.play_button.draw(surface)
         self.exit_button.draw(surface)
     
-    def handle_events(self):
-        for event in pygame.event.get():
+    def dirty_rects(self):
+        state = (self.play_button.is_hovered, self.exit_button.is_hovered)
+        p = self.particles
+        items = [circle_rect(x, y, size) + (color,)
+                 for x, y, size, color in zip(p.ints("x"), p.ints("y"), p.ints("size"), p.colors())]
+        return self.dirty.update(state, items)
+    
+    def whole_rects(self):
+        return [self.play_button.rect, self.exit_button.rect]
+    
+    def handle_events(self, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             
-            mouse_pos = pygame.mouse.get_pos()
-            self.play_button.check_hover(mouse_pos)
-            self.exit_button.check_hover(mouse_pos)
+            # L'hover cambia solo quando il mouse si muove
+            if event.type == pygame.MOUSEMOTION:
+                self.play_button.check_hover(event.pos)
+                self.exit_button.check_hover(event.pos)
             
-            if self.play_button.is_clicked(mouse_pos, event):
-                return "betting_screen"
-            elif self.exit_button.is_clicked(mouse_pos, event):
-                pygame.quit()
-                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if self.play_button.is_clicked(event.pos, event):
+                    return "betting_screen"
+                elif self.exit_button.is_clicked(event.pos, event):
+                    pygame.quit()
+                    sys.exit()
         
-        self.update_particles()
         return None
+    
+    def update(self):
+        self.update_particles()
+    
+    def is_animating(self):
+        # Le particelle del menu salgono sempre
+        return True
 
 class BettingScreen:
-    def __init__(self, balance=1600):
+    def __init__(self, balance=STARTING_BALANCE, rng=None):
+        self.rng = rng or GameRNG()
         self.balance = balance
         self.current_bet = 0
         self.selected_chip = None
+        # Fiche puntate nell'ordine dei clic, per il replay
+        self.picks = []
         
         self.chips = [
-            Chip(WIDTH//2 - 120, HEIGHT - 100, 10, 0),
-            Chip(WIDTH//2 - 60, HEIGHT - 100, 25, 1),
-            Chip(WIDTH//2, HEIGHT - 100, 50, 2),
-            Chip(WIDTH//2 + 60, HEIGHT - 100, 100, 3),
-            Chip(WIDTH//2 + 120, HEIGHT - 100, 500, 4)
+            Chip(WIDTH//2 - 120 + i * 60, HEIGHT - 100, value, i)
+            for i, value in enumerate(CHIP_VALUES)
         ]
         
         self.bet_button = Button(WIDTH//2 - 100, HEIGHT//2 + 100, 200, 50, 
@@ -208,22 +436,23 @@ class BettingScreen:
         self.back_button = Button(20, HEIGHT - 70, 100, 50, 
                                 "INDIETRO", RED, (200, 0, 0))
         
-        self.bet_chips = []
-        self.bet_text = font.render("Scegli la tua puntata", True, WHITE)
+        self.bet_chips = ChipStack(WIDTH//2, HEIGHT//2 - 20)
+        self.bet_text = render_text(font, "Scegli la tua puntata", WHITE)
         self.bet_text_rect = self.bet_text.get_rect(center=(WIDTH//2, HEIGHT//3))
-        self.confetti = []
+        self.confetti = ParticleSystem(CONFETTI_PARTICLES, gravity=0.1, max_y=HEIGHT)
+        self.dirty = DirtyTracker()
     
     def draw_balance(self, surface):
-        balance_text = money_font.render(f"BILANCIO: ${self.balance}", True, GOLD)
+        balance_text = render_text(money_font, f"BILANCIO: ${self.balance}", GOLD)
         balance_rect = balance_text.get_rect(topleft=(20, 20))
         
-        bet_text = money_font.render(f"PUNTATA: ${self.current_bet}", True, GREEN if self.current_bet > 0 else RED)
+        bet_text = render_text(money_font, f"PUNTATA: ${self.current_bet}", GREEN if self.current_bet > 0 else RED)
         bet_rect = bet_text.get_rect(topright=(WIDTH - 20, 20))
         
-        pygame.draw.rect(surface, BLACK, balance_rect.inflate(20, 10), border_radius=5)
-        pygame.draw.rect(surface, GOLD, balance_rect.inflate(20, 10), 2, border_radius=5)
-        pygame.draw.rect(surface, BLACK, bet_rect.inflate(20, 10), border_radius=5)
-        pygame.draw.rect(surface, GREEN if self.current_bet > 0 else RED, bet_rect.inflate(20, 10), 2, border_radius=5)
+        draw_rect(surface, BLACK, balance_rect.inflate(20, 10), border_radius=5)
+        draw_rect(surface, GOLD, balance_rect.inflate(20, 10), 2, border_radius=5)
+        draw_rect(surface, BLACK, bet_rect.inflate(20, 10), border_radius=5)
+        draw_rect(surface, GREEN if self.current_bet > 0 else RED, bet_rect.inflate(20, 10), 2, border_radius=5)
         
         surface.blit(balance_text, balance_rect)
         surface.blit(bet_text, bet_rect)
@@ -232,51 +461,54 @@ class BettingScreen:
         surface.fill(BLACK)
         self.draw_balance(surface)
         
-        for chip in self.chips:
-            chip.draw(surface, assets)
+        surface.blits([chip.sprite(surface) for chip in self.chips], doreturn=False)
         
-        for i, chip in enumerate(self.bet_chips):
-            chip.y = HEIGHT//2 - 20 - (i * 5)
-            chip.draw(surface, assets)
+        self.bet_chips.draw(surface)
         
         surface.blit(self.bet_text, self.bet_text_rect)
         self.bet_button.draw(surface)
         self.back_button.draw(surface)
         
-        for c in self.confetti:
-            pygame.draw.rect(surface, c[2], (c[0], c[1], 5, 5))
+        surface.blits(atlas.particle_rect_blits(self.confetti, 5, 5, surface), doreturn=False)
+    
+    def dirty_rects(self):
+        state = (self.balance, self.current_bet, len(self.bet_chips),
+                 self.bet_button.is_hovered, self.back_button.is_hovered)
+        c = self.confetti
+        items = [(x - 1, y - 1, 7, 7, color) for x, y, color in zip(c.ints("x"), c.ints("y"), c.colors())]
+        return self.dirty.update(state, items)
+    
+    def whole_rects(self):
+        return [self.bet_button.rect, self.back_button.rect]
     
     def update_confetti(self):
-        for c in self.confetti[:]:
-            c[0] += c[3]
-            c[1] += c[4]
-            c[4] += 0.1
-            if c[1] > HEIGHT:
-                self.confetti.remove(c)
-    
-    def add_confetti(self, x, y):
-        for _ in range(20):
-            color = random.choice([RED, GREEN, BLUE, GOLD, PURPLE, WHITE])
-            self.confetti.append([x, y, color, random.uniform(-2, 2), random.uniform(-5, 0)])
-    
-    def handle_events(self, assets):
-        for event in pygame.event.get():
+        self.confetti.update()
+    
+    def add_confetti(self, x, y, count=20):
+        rng = self.rng.cosmetic
+        colors = [rng.choice([RED, GREEN, BLUE, GOLD, PURPLE, WHITE]) for _ in range(count)]
+        vx = [rng.uniform(-2, 2) for _ in range(count)]
+        vy = [rng.uniform(-5, 0) for _ in range(count)]
+        self.confetti.emit(x, y, colors, vx=vx, vy=vy)
+    
+    def handle_events(self, assets, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 return ("quit", 0)
             
-            mouse_pos = pygame.mouse.get_pos()
-            self.bet_button.check_hover(mouse_pos)
-            self.back_button.check_hover(mouse_pos)
+            if event.type == pygame.MOUSEMOTION:
+                self.bet_button.check_hover(event.pos)
+                self.back_button.check_hover(event.pos)
             
-            if event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_pos = event.pos
                 for chip in self.chips:
                     if chip.check_click(mouse_pos):
-                        if self.balance >= chip.value:
-                            self.current_bet += chip.value
-                            self.balance -= chip.value
-                            new_chip = Chip(WIDTH//2, HEIGHT//2, chip.value, chip.color_index)
-                            new_chip.is_selected = True
-                            self.bet_chips.append(new_chip)
+                        bet = place_bet(self.balance, self.current_bet, chip.value)
+                        if bet:
+                            self.balance, self.current_bet = bet
+                            self.bet_chips.add(chip.color_index)
+                            self.picks.append(chip.color_index)
                             assets.coin_sound.play()
                         break
                 
@@ -286,25 +518,33 @@ class BettingScreen:
                     return ("start_game", self.current_bet)
                 
                 if self.back_button.is_clicked(mouse_pos, event):
-                    self.balance += self.current_bet
+                    self.balance, self.current_bet = cancel_bet(self.balance, self.current_bet)
                     return ("back", self.balance)
         
-        self.update_confetti()
         return (None, 0)
+    
+    def update(self):
+        self.update_confetti()
+    
+    def is_animating(self):
+        return len(self.confetti) > 0
 
 class PenaltyGame:
-    def __init__(self, assets, balance, bet_amount):
+    layer_owner = None
+    
+    def __init__(self, assets, balance, bet_amount, rng=None, ledger=None, profiler=NULL_PROFILER):
+        self.rng = rng or GameRNG()
+        self.ledger = ledger
+        self.profiler = profiler
         self.assets = assets
         self.balance = balance
         self.bet_amount = bet_amount
+        self.outcomes = assets.shot_outcomes()
         self.reset_game()
         
-        self.target_positions = [
-            (WIDTH//2 - 200, HEIGHT//2 - 120),  # Alto a sinistra
-            (WIDTH//2 + 200, HEIGHT//2 - 120),  # Alto a destra
-            (WIDTH//2 - 200, HEIGHT//2 + 80),   # Basso sinistra
-            (WIDTH//2 + 200, HEIGHT//2 + 80)    # Basso destra
-        ]
+        # Bersagli, velocità e passi sono quelli di rules: l'animazione
+        # resta identica all'esito precalcolato in outcome_table
+        self.target_positions = TARGET_POSITIONS
         
         # Area della porta (invisibile, usata solo per collisioni)
         self.goal_rect = pygame.Rect(
@@ -314,212 +554,294 @@ class PenaltyGame:
             GOAL_HEIGHT
         )
         
-        self.goal_multiplier = 1.5  # Moltiplicatore per il gol
-        self.penalty_multiplier = 5  # Moltiplicatore per la parata (perdita)
-        self.particles = []
-        self.win_effects = []
+        self.goal_multiplier = GOAL_MULTIPLIER  # Moltiplicatore per il gol
+        self.penalty_multiplier = PENALTY_MULTIPLIER  # Moltiplicatore per la parata (perdita)
+        self.particles = ParticleSystem(TRAIL_PARTICLES)
+        self.win_effects = ParticleSystem(WIN_EFFECTS)
         self.cash_out_button = Button(WIDTH//2 - 100, HEIGHT - 70, 200, 50, 
                                      "RITIRA", GREEN, (0, 200, 0), BLACK)
         self.game_over = False
+        self.dirty = DirtyTracker()
+        # Livelli statici prerenderizzati e pezzi di HUD che contengono
+        self.under = None
+        self.layer = None
+        self.layer_state = None
+        self.under_ready = False
+        self.hud = []
+        # Frazione del passo di fisica successivo, per interpolare il disegno
+        self.alpha = 1.0
     
     def reset_game(self):
-        self.ball_pos = [WIDTH//2, HEIGHT - 100]
+        self.ball_pos = list(BALL_START)
         self.ball_target = None
         self.ball_moving = False
-        self.ball_speed = 20
+        self.ball_speed = BALL_SPEED
         
-        self.keeper_rect = self.assets.keeper.get_rect(center=(WIDTH//2, HEIGHT//2))
+        self.keeper_rect = self.assets.keeper.get_rect(center=KEEPER_START)
         self.keeper_dive_target = None
+        self.keeper_dive = DIVE_STAY
         self.keeper_moving = False
         
         self.selected_target = None
         self.result_text = ""
         self.result_details = ""
         self.game_active = True
+        self.store_positions()
     
     def reset_shot(self):
-        self.ball_pos = [WIDTH//2, HEIGHT - 100]
+        self.ball_pos = list(BALL_START)
         self.ball_target = None
         self.ball_moving = False
         self.result_text = ""
         self.result_details = ""
-        self.keeper_rect.center = (WIDTH//2, HEIGHT//2)
+        self.keeper_rect.center = KEEPER_START
         self.keeper_moving = False
+        self.store_positions()
+    
+    def store_positions(self):
+        # Posizioni all'inizio del passo, per interpolare tra due passi di fisica
+        self.prev_ball_pos = tuple(self.ball_pos)
+        self.prev_keeper_center = self.keeper_rect.center
+    
+    def interpolate(self, prev, current):
+        return (round(prev[0] + (current[0] - prev[0]) * self.alpha),
+                round(prev[1] + (current[1] - prev[1]) * self.alpha))
+    
+    def sprite_rects(self):
+        keeper_rect = self.keeper_rect.copy()
+        keeper_rect.center = self.interpolate(self.prev_keeper_center, self.keeper_rect.center)
+        ball_rect = self.assets.ball.get_rect(center=self.interpolate(self.prev_ball_pos, self.ball_pos))
+        return keeper_rect, ball_rect
     
     def reset_keeper(self):
-        # 95% di probabilità che il portiere si muova, 5% che resti fermo
-        if random.random() < 0.95:
-            directions = ["left", "right"]
-            direction = random.choice(directions)
-            
-            if direction == "left":
-                self.keeper_dive_target = (self.keeper_rect.centerx - 150, self.keeper_rect.centery)
-            else:
-                self.keeper_dive_target = (self.keeper_rect.centerx + 150, self.keeper_rect.centery)
-        else:
-            self.keeper_dive_target = self.keeper_rect.center
-        
+        self.keeper_dive = choose_dive(self.rng.outcome)
+        self.keeper_dive_target = dive_target(self.keeper_dive, self.keeper_rect.center)
         self.keeper_moving = True
     
     def move_keeper(self):
+        # Già sul bersaglio (tuffo "fermo") o arrivato: il portiere si ferma,
+        # altrimenti is_animating resterebbe vero per sempre
+        center = None
         if self.keeper_rect.center != self.keeper_dive_target:
-            dx = self.keeper_dive_target[0] - self.keeper_rect.centerx
-            dy = self.keeper_dive_target[1] - self.keeper_rect.centery
-            dist = math.hypot(dx, dy)
-            
-            if dist > 2:
-                speed = 8 if dist > 50 else 4
-                self.keeper_rect.centerx += int(dx / dist * speed)
-                self.keeper_rect.centery += int(dy / dist * speed)
-            else:
-                self.keeper_moving = False
+            center = keeper_step(self.keeper_rect.center, self.keeper_dive_target)
+        if center:
+            self.keeper_rect.center = center
+        else:
+            self.keeper_moving = False
     
     def move_ball(self):
         if self.ball_target:
-            dx = self.ball_target[0] - self.ball_pos[0]
-            dy = self.ball_target[1] - self.ball_pos[1]
-            dist = math.hypot(dx, dy)
-            
-            if dist > self.ball_speed:
-                self.ball_pos[0] += dx / dist * self.ball_speed
-                self.ball_pos[1] += dy / dist * self.ball_speed
+            pos = ball_step(self.ball_pos, self.ball_target, self.ball_speed)
+            if pos:
+                self.ball_pos[0], self.ball_pos[1] = pos
                 
-                if random.random() < 0.3:
-                    self.particles.append([
-                        self.ball_pos[0] + random.randint(-5, 5),
-                        self.ball_pos[1] + random.randint(-5, 5),
-                        random.randint(2, 5),
-                        random.choice([RED, WHITE, GOLD])
-                    ])
+                rng = self.rng.cosmetic
+                if rng.random() < 0.3:
+                    self.particles.emit(
+                        self.ball_pos[0] + rng.randint(-5, 5),
+                        self.ball_pos[1] + rng.randint(-5, 5),
+                        rng.choice([RED, WHITE, GOLD]),
+                        vy=2, size=rng.randint(2, 5), dsize=-0.1
+                    )
             else:
                 self.ball_pos[0], self.ball_pos[1] = self.ball_target
                 self.ball_moving = False
                 self.check_shot_result()
     
     def update_particles(self):
-        for p in self.particles[:]:
-            p[1] += 2
-            p[2] -= 0.1
-            if p[2] <= 0:
-                self.particles.remove(p)
+        self.particles.update()
     
     def add_win_effect(self, amount):
-        x = random.randint(WIDTH//2 - 100, WIDTH//2 + 100)
-        y = random.randint(HEIGHT//2 - 50, HEIGHT//2 + 50)
-        self.win_effects.append({
-            "text": f"+${amount}",
-            "x": x,
-            "y": y,
-            "alpha": 255,
-            "color": GOLD
-        })
+        x = self.rng.cosmetic.randint(WIDTH//2 - 100, WIDTH//2 + 100)
+        y = self.rng.cosmetic.randint(HEIGHT//2 - 50, HEIGHT//2 + 50)
+        self.win_effects.emit(x, y, GOLD, vy=-1, alpha=255, dalpha=-3, value=amount)
     
     def update_win_effects(self):
-        for effect in self.win_effects[:]:
-            effect["y"] -= 1
-            effect["alpha"] -= 3
-            if effect["alpha"] <= 0:
-                self.win_effects.remove(effect)
+        self.win_effects.update()
+    
+    def win_effect_items(self):
+        e = self.win_effects
+        for x, y, alpha, amount, color in zip(e.ints("x"), e.ints("y"), e.ints("alpha"), e.ints("value"), e.colors()):
+            yield render_text(font, f"+${amount}", color), x, y, alpha
     
     def check_shot_result(self):
-        ball_rect = self.assets.ball.get_rect(center=self.ball_pos)
-        keeper_catch_rect = self.keeper_rect.inflate(-30, -30)
+        self.outcomes = self.assets.shot_outcomes()
+        
+        saved = self.outcomes[self.selected_target][self.keeper_dive]
+        self.balance, delta, game_over = settle_shot(self.balance, self.bet_amount, saved,
+                                                     self.goal_multiplier, self.penalty_multiplier)
+        if self.ledger:
+            self.ledger.settle(saved, delta, self.balance)
         
-        if ball_rect.colliderect(keeper_catch_rect):
+        if saved:
             self.result_text = "PARATA!"
-            penalty_amount = int(self.bet_amount * self.penalty_multiplier)
-            self.result_details = f"Hai perso ${penalty_amount}!"
-            self.balance -= penalty_amount
+            self.result_details = f"Hai perso ${-delta}!"
             self.assets.save_sound.play()
             self.assets.lose_sound.play()
         else:
             self.result_text = "GOOOOL!"
-            win_amount = int(self.bet_amount * self.goal_multiplier)
-            self.balance += win_amount
-            self.result_details = f"Moltiplicatore: x{self.goal_multiplier} - Vinci ${win_amount}!"
+            self.result_details = f"Moltiplicatore: x{self.goal_multiplier} - Vinci ${delta}!"
             self.assets.goal_sound.play()
             self.assets.win_sound.play()
-            self.add_win_effect(win_amount)
+            self.add_win_effect(delta)
         
-        if self.balance <= 0:
+        if game_over:
             self.game_over = True
     
     def draw_targets(self, surface):
         for i, pos in enumerate(self.target_positions):
-            target_surf = pygame.Surface((60, 60), pygame.SRCALPHA)
-            pygame.draw.circle(target_surf, (255, 255, 255, 50), (30, 30), 30)
-            pygame.draw.circle(target_surf, WHITE, (30, 30), 30, 2)
-            
-            if self.selected_target == i:
-                pygame.draw.circle(target_surf, (255, 215, 0, 150), (30, 30), 35, 5)
-            
-            surface.blit(target_surf, (pos[0]-30, pos[1]-30))
+            target_surf = target_sprite(self.selected_target == i)
+            surface.blit(target_surf, (pos[0] - TARGET_RADIUS, pos[1] - TARGET_RADIUS))
     
     def draw_particles(self, surface):
-        for p in self.particles:
-            pygame.draw.circle(surface, p[3], (int(p[0]), int(p[1])), int(p[2]))
+        # Un solo blits per tutte le particelle, dai cerchi dell'atlante
+        surface.blits(atlas.particle_blits(self.particles, surface), doreturn=False)
     
     def draw_win_effects(self, surface):
-        for effect in self.win_effects:
-            text_surf = font.render(effect["text"], True, effect["color"])
-            text_surf.set_alpha(effect["alpha"])
-            surface.blit(text_surf, (effect["x"], effect["y"]))
+        for text_surf, x, y, alpha in self.win_effect_items():
+            # La superficie è condivisa dalla cache: l'alpha va ripristinato
+            text_surf.set_alpha(alpha)
+            surface.blit(text_surf, (x, y))
+            text_surf.set_alpha(None)
     
-    def draw(self, surface):
-        surface.blit(self.assets.background, (0, 0))
-        
-        if not self.ball_moving and not self.result_text and self.game_active and not self.game_over:
-            self.draw_targets(surface)
-        
-        surface.blit(self.assets.keeper, self.keeper_rect)
-        surface.blit(self.assets.ball, self.assets.ball.get_rect(center=self.ball_pos))
-        self.draw_particles(surface)
-        
-        balance_text = font.render(f"Saldo: ${self.balance}", True, GOLD)
-        surface.blit(balance_text, (20, 20))
+    def static_state(self):
+        # Tutto ciò che cambia solo a fine tiro o al passaggio del mouse
+        targets_visible = not self.ball_moving and not self.result_text and self.game_active and not self.game_over
+        return (self.balance, self.bet_amount, self.result_text, self.result_details,
+                self.game_over, self.game_active, targets_visible, self.selected_target,
+                self.cash_out_button.is_hovered)
+    
+    def hud_pieces(self):
+        # Scritte e pulsante come (superficie, posizione), nell'ordine di disegno
+        pieces = [(render_text(font, f"Saldo: ${self.balance}", GOLD), (20, 20)),
+                  (render_text(font, f"Puntata: ${self.bet_amount}", GREEN), (20, 50))]
         
-        bet_text = font.render(f"Puntata: ${self.bet_amount}", True, GREEN)
-        surface.blit(bet_text, (20, 50))
+        def centered(surf, center):
+            pieces.append((surf, surf.get_rect(center=center).topleft))
         
         if self.result_text:
             color = GOLD if "GOOOOL" in self.result_text else RED
-            result_surface = big_font.render(self.result_text, True, color)
-            surface.blit(result_surface, result_surface.get_rect(center=(WIDTH//2, 50)))
+            centered(render_text(big_font, self.result_text, color), (WIDTH//2, 50))
             
             if self.result_details:
-                details_surface = font.render(self.result_details, True, WHITE)
-                surface.blit(details_surface, details_surface.get_rect(center=(WIDTH//2, 100)))
+                centered(render_text(font, self.result_details, WHITE), (WIDTH//2, 100))
             
             if not self.game_over:
-                next_shot_text = font.render("Premi un tasto per il prossimo tiro", True, WHITE)
-                surface.blit(next_shot_text, next_shot_text.get_rect(center=(WIDTH//2, HEIGHT - 100)))
+                centered(render_text(font, "Premi un tasto per il prossimo tiro", WHITE), (WIDTH//2, HEIGHT - 100))
         
         if self.game_over:
-            game_over_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            game_over_surf.fill((0, 0, 0, 200))
-            surface.blit(game_over_surf, (0, 0))
-            
-            game_over_text = big_font.render("GAME OVER", True, RED)
-            surface.blit(game_over_text, game_over_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50)))
-            
-            no_money_text = font.render("Non hai più soldi per giocare", True, WHITE)
-            surface.blit(no_money_text, no_money_text.get_rect(center=(WIDTH//2, HEIGHT//2)))
-            
-            return_text = font.render("Premi un tasto per tornare al menu", True, WHITE)
-            surface.blit(return_text, return_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 100)))
+            pieces.append((overlay_sprite((WIDTH, HEIGHT)), (0, 0)))
+            centered(render_text(big_font, "GAME OVER", RED), (WIDTH//2, HEIGHT//2 - 50))
+            centered(render_text(font, "Non hai più soldi per giocare", WHITE), (WIDTH//2, HEIGHT//2))
+            centered(render_text(font, "Premi un tasto per tornare al menu", WHITE), (WIDTH//2, HEIGHT//2 + 100))
         elif self.game_active:
-            self.cash_out_button.draw(surface)
+            pieces.append((self.cash_out_button.sprite(), self.cash_out_button.rect.topleft))
+        return pieces
+    
+    def static_layers(self, surface):
+        # Sfondo, bersagli e HUD già composti (layer), rifatti solo quando
+        # cambia static_state()
+        state = self.static_state()
+        size = surface.get_size()
+        if self.layer is None or self.layer.get_size() != size:
+            self.under = layer_surface("game_under", size, surface)
+            self.layer = layer_surface("game", size, surface)
+            self.layer_state = None
+        if state != self.layer_state or PenaltyGame.layer_owner is not self:
+            # Le superfici sono condivise tra le partite: si rifanno anche se
+            # l'ultima a disegnarle è stata un'altra istanza
+            PenaltyGame.layer_owner = self
+            self.layer_state = state
+            self.under_ready = False
+            self.draw_static(self.layer)
+            self.hud = [(surf, surf.get_rect(topleft=pos)) for surf, pos in self.hud_pieces()]
+            self.layer.blits(self.hud, doreturn=False)
+        return self.layer
+    
+    def under_layer(self):
+        # Lo stesso senza HUD serve solo dove uno sprite copre una scritta:
+        # si compone al primo frame che lo usa, non a ogni cambio di stato
+        if not self.under_ready:
+            self.under_ready = True
+            self.draw_static(self.under)
+        return self.under
+    
+    def draw_static(self, surface):
+        surface.blit(self.assets.background, (0, 0))
+        if self.layer_state[6]:
+            with self.profiler.stage("draw.targets"):
+                self.draw_targets(surface)
+    
+    def draw(self, surface):
+        stage = self.profiler.stage
+        keeper_rect, ball_rect = self.sprite_rects()
+        if self.game_over:
+            # Il velo del game over copre anche gli sprite: niente livelli
+            with stage("draw.background"):
+                surface.blit(self.assets.background, (0, 0))
+            with stage("draw.sprites"):
+                surface.blit(self.assets.keeper, keeper_rect)
+                surface.blit(self.assets.ball, ball_rect)
+            with stage("draw.particles"):
+                self.draw_particles(surface)
+            with stage("draw.hud"):
+                surface.blits(self.hud_pieces(), doreturn=False)
+            with stage("draw.win_effects"):
+                self.draw_win_effects(surface)
+            return
+        
+        with stage("draw.background"):
+            layer = self.static_layers(surface)
+            # L'HUD sta sopra gli sprite: dove uno lo copre si parte dallo
+            # sfondo senza HUD e la scritta si rimette dopo gli sprite
+            p = self.particles
+            moving = [keeper_rect, ball_rect]
+            moving += [circle_rect(x, y, size) for x, y, size in zip(p.ints("x"), p.ints("y"), p.ints("size"))]
+            covered = [(surf, rect) for surf, rect in self.hud if rect.collidelist(moving) != -1]
+            # Con i rettangoli sporchi il clip limita già la copia alla zona
+            # cambiata: copiare le singole zone è risultato più lento, il
+            # portiere ne copre quasi tutta l'area
+            surface.blit(layer, (0, 0))
+            if covered:
+                under = self.under_layer()
+                for surf, rect in covered:
+                    surface.blit(under, rect, rect)
+        
+        with stage("draw.sprites"):
+            surface.blit(self.assets.keeper, keeper_rect)
+            surface.blit(self.assets.ball, ball_rect)
+        with stage("draw.particles"):
+            self.draw_particles(surface)
+        
+        with stage("draw.hud"):
+            surface.blits(covered, doreturn=False)
         
-        self.draw_win_effects(surface)
+        with stage("draw.win_effects"):
+            self.draw_win_effects(surface)
+    
+    def dirty_rects(self):
+        # Saldo, testi, bersagli e pulsante cambiano solo a fine tiro: in quel
+        # caso ridisegno completo, altrimenti solo portiere, palla ed effetti
+        state = self.static_state()
+        
+        items = [tuple(rect) for rect in self.sprite_rects()]
+        p = self.particles
+        items += [circle_rect(x, y, size) + (color,)
+                  for x, y, size, color in zip(p.ints("x"), p.ints("y"), p.ints("size"), p.colors())]
+        for text_surf, x, y, alpha in self.win_effect_items():
+            items.append(tuple(text_surf.get_rect(topleft=(x, y))) + (alpha,))
+        return self.dirty.update(state, items)
+    
+    def whole_rects(self):
+        return [self.cash_out_button.rect]
     
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 return "quit"
             
-            mouse_pos = pygame.mouse.get_pos()
-            if not self.game_over:
-                self.cash_out_button.check_hover(mouse_pos)
+            if event.type == pygame.MOUSEMOTION and not self.game_over:
+                self.cash_out_button.check_hover(event.pos)
             
             if event.type == pygame.KEYDOWN:
                 if self.result_text and not self.game_over:
@@ -529,12 +851,12 @@ class PenaltyGame:
                     return "menu"
             
             if event.type == pygame.MOUSEBUTTONDOWN and not self.game_over:
-                if self.cash_out_button.is_clicked(mouse_pos, event) and self.game_active:
+                if self.cash_out_button.is_clicked(event.pos, event) and self.game_active:
                     return "cash_out"
                 
                 if not self.ball_moving and not self.result_text and self.game_active:
                     for i, pos in enumerate(self.target_positions):
-                        if math.hypot(event.pos[0] - pos[0], event.pos[1] - pos[1]) < 30:
+                        if math.hypot(event.pos[0] - pos[0], event.pos[1] - pos[1]) < TARGET_RADIUS:
                             self.selected_target = i
                             self.ball_target = pos
                             self.ball_moving = True
@@ -545,6 +867,8 @@ class PenaltyGame:
         return None
     
     def update(self):
+        self.store_positions()
+        
         if self.ball_moving:
             self.move_ball()
         
@@ -553,63 +877,250 @@ class PenaltyGame:
         
         self.update_particles()
         self.update_win_effects()
+    
+    def is_animating(self):
+        # Finché le posizioni del passo precedente sono diverse da quelle
+        # attuali il disegno interpolato non è ancora quello finale
+        return (self.ball_moving or self.keeper_moving or len(self.particles) > 0
+                or len(self.win_effects) > 0 or self.prev_ball_pos != tuple(self.ball_pos)
+                or self.prev_keeper_center != self.keeper_rect.center)
+
+def draw_loading_screen(surface):
+    surface.fill(BLACK)
+    text = render_text(big_font, "Caricamento...", WHITE)
+    surface.blit(text, text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+
+def wait_for_assets(viewport, clock, assets):
+    # Si aspetta solo se il prefetch non ha ancora finito
+    while not assets.ready():
+        pygame.event.pump()
+        draw_loading_screen(viewport.canvas)
+        viewport.flip()
+        clock.tick(FPS)
 
-def main():
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+def main(dirty_rects=False, fps=FPS, fast_forward=False, seed=None, replay_log=None,
+         ledger_path=None, ledger_sync=SYNC_INTERVAL, profile=False, profile_stream=None,
+         idle=True, window_size=None, fullscreen=False, smooth_scale=False, render_scale=1.0, bot=None,
+         capture_path=None, capture_policy="drop", capture_buffers=RING_SIZE, capture_every=1):
+    # Audio, video e font si inizializzano solo quando si avvia il gioco,
+    # così il modulo si può importare senza aprire una finestra
+    pygame.init()
+    pygame.mixer.init()
+    # Superfici, scritte e immagini nascono alla scala di rendering: se
+    # cambia nello stesso processo quelle in cache si rifanno
+    if set_scale(render_scale):
+        clear_sprites()
+        atlas.clear()
+        text_cache.clear()
+    init_fonts()
+    
+    # Si disegna sempre con le coordinate di WIDTH x HEIGHT su un frame di
+    # WIDTH*render_scale x HEIGHT*render_scale pixel, scalato una volta sola
+    # nella finestra
+    viewport = Viewport(window_size or (WIDTH, HEIGHT), fullscreen, smooth_scale, render_scale)
     pygame.display.set_caption("Ultimate Penalty Casino")
     clock = pygame.time.Clock()
+    # Tempi di ogni fase del loop; F3 mostra o nasconde l'overlay. I frame
+    # persi si contano sul frame rate scelto
+    profiler = FrameProfiler(fps or FPS, stream_path=profile_stream, visible=profile)
+    renderer = DirtyRenderer(viewport.canvas, dirty_rects, profiler, viewport)
+    profiler.add_source("frame", renderer.stats)
+    # La fisica avanza a passo fisso; fps=0 toglie il limite al frame rate
+    timestep = FixedTimestep(fast_forward=fast_forward)
+    profiler.add_source("physics", timestep.stats)
+    dt = timestep.step
+    # Schermata ferma: si aspetta l'input invece di ridisegnare a vuoto
+    # (mai in avanti veloce, dove non c'è nessun input reale da aspettare);
+    # il menu, sempre animato, dopo un po' senza input rallenta
+    scheduler = IdleScheduler(idle and not fast_forward)
+    scheduler.install()
+    profiler.add_source("idle", scheduler.stats)
     
+    # Il menu non usa nessun asset: partita e suoni si precaricano in background
     assets = GameAssets()
+    assets.prefetch()
     
-    main_menu = MainMenu()
+    # Tutta la casualità passa da qui: con lo stesso seed la sessione si ripete
+    rng = GameRNG(seed)
+    main_menu = MainMenu(rng)
     betting_screen = None
     game = None
+    scene = main_menu
     
     current_screen = "main_menu"
-    balance = 1600
+    # Con il registro il saldo sopravvive alla chiusura del gioco
+    ledger = Ledger(ledger_path, ledger_sync) if ledger_path else None
+    balance = ledger.balance if ledger else STARTING_BALANCE
     running = True
+    recorder = ReplayRecorder(replay_log, rng.seed, balance) if replay_log else None
+    # Registrazione dei frame mostrati, codificati in un thread a parte
+    capture = (FrameCapture(capture_path, viewport.frame.get_size(), fps or FPS, capture_buffers,
+                            capture_policy, capture_every) if capture_path else None)
     
-    while running:
-        if current_screen == "main_menu":
-            action = main_menu.handle_events()
-            if action == "betting_screen":
-                current_screen = "betting_screen"
-                betting_screen = BettingScreen(balance)
-        
-        elif current_screen == "betting_screen":
-            action, value = betting_screen.handle_events(assets)
-            if action == "start_game":
-                current_screen = "game"
-                game = PenaltyGame(assets, betting_screen.balance, value)
-            elif action == "back":
-                current_screen = "main_menu"
-            elif action == "quit":
-                running = False
-        
-        elif current_screen == "game":
-            action = game.handle_events()
-            if action == "cash_out":
-                balance = game.balance
-                current_screen = "betting_screen"
-                betting_screen = BettingScreen(balance)
-            elif action == "menu":
-                balance = game.balance
-                current_screen = "main_menu"
-            elif action == "quit":
-                running = False
-        
-        if current_screen == "main_menu":
-            main_menu.draw(screen)
-        elif current_screen == "betting_screen":
-            betting_screen.draw(screen, assets)
-        elif current_screen == "game":
-            game.update()
-            game.draw(screen)
-        
-        pygame.display.flip()
-        clock.tick(FPS)
+    try:
+        while running:
+            if bot:
+                # Soak test (soak.py): il bot posta gli eventi di questo frame
+                bot.step(current_screen, scene)
+            
+            if scheduler.should_wait(scene):
+                if not scheduler.wait():
+                    continue
+                # L'attesa non è tempo di gioco né un frame perso
+                clock.tick()
+                profiler.resume()
+            
+            with profiler.stage("events"):
+                events, toggled = profiler.filter_events(viewport.map_events(scheduler.get()))
+            if toggled or scheduler.exposed(events):
+                renderer.invalidate()
+            
+            with profiler.stage("handle"):
+                if current_screen == "main_menu":
+                    action = main_menu.handle_events(events)
+                    if action == "betting_screen":
+                        current_screen = "betting_screen"
+                        betting_screen = BettingScreen(balance, rng)
+                
+                elif current_screen == "betting_screen":
+                    action, value = betting_screen.handle_events(assets, events)
+                    if recorder and action in ("start_game", "back"):
+                        for color_index in betting_screen.picks:
+                            recorder.chip(color_index)
+                    if action == "start_game":
+                        if not assets.ready():
+                            wait_for_assets(viewport, clock, assets)
+                            renderer.invalidate()
+                        current_screen = "game"
+                        game = PenaltyGame(assets, betting_screen.balance, value, rng, ledger, profiler)
+                        if ledger:
+                            ledger.bet(value, betting_screen.balance)
+                        if recorder:
+                            recorder.start(assets.ball.get_size(), assets.keeper.get_size())
+                    elif action == "back":
+                        if recorder:
+                            recorder.cancel()
+                        current_screen = "main_menu"
+                    elif action == "quit":
+                        running = False
+                
+                elif current_screen == "game":
+                    action = game.handle_events(events)
+                    if action == "shot" and recorder:
+                        recorder.shot(game.selected_target)
+                    if action == "cash_out":
+                        balance = game.balance
+                        if recorder:
+                            recorder.cash_out(balance)
+                        current_screen = "betting_screen"
+                        betting_screen = BettingScreen(balance, rng)
+                    elif action == "menu":
+                        balance = game.balance
+                        if recorder:
+                            recorder.menu(balance)
+                        current_screen = "main_menu"
+                    elif action == "quit":
+                        running = False
+            
+            if current_screen == "main_menu":
+                scene, draw = main_menu, main_menu.draw
+            elif current_screen == "betting_screen":
+                scene, draw = betting_screen, lambda surface: betting_screen.draw(surface, assets)
+            else:
+                scene, draw = game, game.draw
+            
+            with profiler.stage("update"):
+                for _ in range(timestep.advance(dt)):
+                    scene.update()
+            if scene is game:
+                game.alpha = timestep.alpha
+            
+            if running:
+                renderer.present(scene, draw)
+                if capture:
+                    with profiler.stage("capture"):
+                        capture.grab(viewport.frame)
+            # Senza input da un po' le schermate sempre animate rallentano
+            frame_rate = scheduler.frame_rate(fps)
+            profiler.set_fps(frame_rate or FPS)
+            dt = clock.tick(frame_rate) / 1000
+            profiler.end_frame(scene_counts(scene))
+    finally:
+        # Anche uscendo dal menu con sys.exit() il replay resta completo
+        if recorder:
+            recorder.close(game.balance if current_screen == "game" else balance)
+        if ledger:
+            ledger.close()
+        if capture:
+            capture.close()
+            print(capture.report())
+        profiler.close()
     
     pygame.quit()
     sys.exit()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Ultimate Penalty Casino")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="ridisegna e aggiorna solo le zone dello schermo cambiate")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="limite di frame al secondo (0 = nessun limite)")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="un passo di fisica per frame senza attendere l'orologio")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed della sessione, per riprodurla esattamente")
+    parser.add_argument("--replay-log", default=None,
+                        help="registra la sessione in questo file (verifica con replay.py)")
+    parser.add_argument("--ledger", default=None,
+                        help="registro persistente del saldo, ripreso all'avvio")
+    parser.add_argument("--ledger-sync", type=float, default=SYNC_INTERVAL,
+                        help="secondi massimi tra due fsync del registro")
+    parser.add_argument("--profile", action="store_true",
+                        help="mostra subito l'overlay del profiler (F3 per nasconderlo)")
+    parser.add_argument("--profile-stream", default=None,
+                        help="scrive una riga JSON di statistiche al secondo (- = stdout)")
+    parser.add_argument("--no-idle", action="store_true",
+                        help="ridisegna sempre a FPS anche con la schermata ferma")
+    parser.add_argument("--window-size", default=None, metavar="LxA",
+                        help="dimensione della finestra, es. 1600x1200: il frame si scala "
+                             "una volta per frame")
+    parser.add_argument("--render-scale", type=float, default=1.0, metavar="S",
+                        help=f"risoluzione interna, es. 0.5 = {WIDTH // 2}x{HEIGHT // 2} scalato "
+                             "alla finestra (meno pixel da disegnare)")
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="schermo intero alla risoluzione del desktop, scalato come --window-size")
+    parser.add_argument("--smooth-scale", action="store_true",
+                        help="scala con smoothscale invece del più veloce nearest-neighbour")
+    parser.add_argument("--capture", default=None, metavar="PERCORSO",
+                        help="registra i frame: cartella di PNG, o video RGB24 grezzo se finisce in .rgb")
+    parser.add_argument("--capture-policy", choices=POLICIES, default="drop",
+                        help="buffer pieni: salta il frame (drop) o aspetta il codificatore (block)")
+    parser.add_argument("--capture-buffers", type=int, default=RING_SIZE,
+                        help="frame che possono attendere la codifica")
+    parser.add_argument("--capture-every", type=int, default=1,
+                        help="registra un frame ogni N (2 = metà del frame rate)")
+    args = parser.parse_args()
+    if args.capture_buffers < 1 or args.capture_every < 1:
+        parser.error("--capture-buffers e --capture-every devono essere almeno 1")
+    if args.seed is not None and not 0 <= args.seed < 2 ** 64:
+        # Il replay lo registra come intero a 64 bit senza segno
+        parser.error("--seed deve essere tra 0 e 2^64 - 1")
+    if not 0.1 <= args.render_scale <= 1:
+        parser.error("--render-scale deve essere tra 0.1 e 1")
+    window_size = None
+    if args.window_size:
+        try:
+            window_size = tuple(int(v) for v in args.window_size.lower().split("x"))
+        except ValueError:
+            window_size = ()
+        if len(window_size) != 2 or min(window_size) < 1:
+            parser.error(f"--window-size non valido: {args.window_size}")
+    main(dirty_rects=args.dirty_rects, fps=args.fps, fast_forward=args.fast_forward,
+         seed=args.seed, replay_log=args.replay_log, ledger_path=args.ledger,
+         ledger_sync=args.ledger_sync, profile=args.profile, profile_stream=args.profile_stream,
+         idle=not args.no_idle, window_size=window_size, fullscreen=args.fullscreen,
+         smooth_scale=args.smooth_scale, render_scale=args.render_scale,
+         capture_path=args.capture, capture_policy=args.capture_policy,
+         capture_buffers=args.capture_buffers, capture_every=args.capture_every)
\ No newline at end of file
@@ -0,0 +1,193 @@
+# Regole del gioco (saldo, puntate, tuffo del portiere, pagamenti) e
+# geometria del tiro, senza dipendenze da pygame: si importa in pochi
+# millisecondi dai processi di simulazione e dai test.
+# PenaltyGame.move_ball e move_keeper avanzano con ball_step e keeper_step,
+# le stesse funzioni usate qui per precalcolare l'esito di un tiro senza
+# finestra né animazione.
+import math
+import random
+
+# Costanti del gioco
+WIDTH, HEIGHT = 800, 600
+FPS = 60
+GOAL_WIDTH = 500
+GOAL_HEIGHT = 300
+
+BALL_START = (WIDTH//2, HEIGHT - 100)
+KEEPER_START = (WIDTH//2, HEIGHT//2)
+TARGET_POSITIONS = [
+    (WIDTH//2 - 200, HEIGHT//2 - 120),  # Alto a sinistra
+    (WIDTH//2 + 200, HEIGHT//2 - 120),  # Alto a destra
+    (WIDTH//2 - 200, HEIGHT//2 + 80),   # Basso sinistra
+    (WIDTH//2 + 200, HEIGHT//2 + 80)    # Basso destra
+]
+
+BALL_SPEED = 20
+KEEPER_MOVE_PROB = 0.95  # 95% di probabilità che il portiere si muova
+KEEPER_DIVE_DISTANCE = 150
+KEEPER_CATCH_INFLATE = (-30, -30)
+
+# Tuffi del portiere
+DIVE_STAY, DIVE_LEFT, DIVE_RIGHT = 0, 1, 2
+DIVES = (DIVE_STAY, DIVE_LEFT, DIVE_RIGHT)
+DIVE_OFFSETS = {DIVE_STAY: 0, DIVE_LEFT: -KEEPER_DIVE_DISTANCE, DIVE_RIGHT: KEEPER_DIVE_DISTANCE}
+
+# Dimensioni degli sprite come li carica GameAssets: ball.png (360x360)
+# scalato a 0.15, keeper.webp (512x512) scalato a 0.6
+BALL_SIZE = (54, 54)
+KEEPER_SIZE = (307, 307)
+
+GOAL_MULTIPLIER = 1.5
+PENALTY_MULTIPLIER = 5
+STARTING_BALANCE = 1600
+CHIP_VALUES = (10, 25, 50, 100, 500)
+
+
+# Rettangoli come tuple (x, y, w, h) con la stessa aritmetica di pygame.Rect
+def rect_from_center(size, center):
+    w, h = size
+    return (int(center[0]) - w // 2, int(center[1]) - h // 2, w, h)
+
+
+def inflate_rect(rect, dx, dy):
+    x, y, w, h = rect
+    return (x - int(dx / 2), y - int(dy / 2), w + dx, h + dy)
+
+
+def rects_collide(a, b):
+    if a[2] == 0 or a[3] == 0 or b[2] == 0 or b[3] == 0:
+        return False
+    ax1, ax2 = sorted((a[0], a[0] + a[2]))
+    ay1, ay2 = sorted((a[1], a[1] + a[3]))
+    bx1, bx2 = sorted((b[0], b[0] + b[2]))
+    by1, by2 = sorted((b[1], b[1] + b[3]))
+    return ax1 < bx2 and ay1 < by2 and ax2 > bx1 and ay2 > by1
+
+
+def ball_step(pos, target, speed=BALL_SPEED):
+    # Un passo di move_ball: nuova posizione, None se la palla arriva al bersaglio
+    dx = target[0] - pos[0]
+    dy = target[1] - pos[1]
+    dist = math.hypot(dx, dy)
+    if dist <= speed:
+        return None
+    return (pos[0] + dx / dist * speed, pos[1] + dy / dist * speed)
+
+
+def keeper_step(center, target):
+    # Un passo di move_keeper: nuovo centro, None se il portiere è arrivato
+    dx = target[0] - center[0]
+    dy = target[1] - center[1]
+    dist = math.hypot(dx, dy)
+    if dist <= 2:
+        return None
+    speed = 8 if dist > 50 else 4
+    return (center[0] + int(dx / dist * speed), center[1] + int(dy / dist * speed))
+
+
+def ball_flight_updates(target, start=BALL_START, speed=BALL_SPEED):
+    # Numero di chiamate a update() finché move_ball arriva al bersaglio
+    # e chiama check_shot_result
+    pos = start
+    updates = 1
+    while True:
+        pos = ball_step(pos, target, speed)
+        if pos is None:
+            return updates
+        updates += 1
+
+
+def keeper_center_after(dive, steps, start=KEEPER_START):
+    # Posizione del portiere dopo `steps` chiamate a move_keeper
+    center = start
+    target = dive_target(dive, start)
+    for _ in range(steps):
+        if center == target:
+            break
+        step = keeper_step(center, target)
+        if step is None:
+            break
+        center = step
+    return center
+
+
+def shot_is_saved(target_index, dive, ball_size=BALL_SIZE, keeper_size=KEEPER_SIZE):
+    target = TARGET_POSITIONS[target_index]
+    # move_ball controlla il risultato prima che move_keeper si muova nello stesso frame
+    steps = ball_flight_updates(target) - 1
+    keeper_rect = rect_from_center(keeper_size, keeper_center_after(dive, steps))
+    catch_rect = inflate_rect(keeper_rect, *KEEPER_CATCH_INFLATE)
+    ball_rect = rect_from_center(ball_size, target)
+    return rects_collide(ball_rect, catch_rect)
+
+
+_outcome_tables = {}
+
+
+def outcome_table(ball_size=BALL_SIZE, keeper_size=KEEPER_SIZE):
+    # Tabella saved[bersaglio][tuffo] precalcolata per le dimensioni degli
+    # sprite; la chiave include la porta così cambiare GOAL_WIDTH/GOAL_HEIGHT
+    # o la scala degli asset produce una nuova tabella
+    key = (tuple(ball_size), tuple(keeper_size), GOAL_WIDTH, GOAL_HEIGHT)
+    table = _outcome_tables.get(key)
+    if table is None:
+        table = tuple(
+            tuple(shot_is_saved(t, d, ball_size, keeper_size) for d in DIVES)
+            for t in range(len(TARGET_POSITIONS))
+        )
+        _outcome_tables[key] = table
+    return table
+
+
+class GameRNG:
+    # Generatori separati derivati dallo stesso seed: "outcome" decide i
+    # tuffi del portiere, "cosmetic" le particelle. Gli effetti grafici non
+    # possono quindi cambiare l'esito dei tiri, e una sessione si riproduce
+    # conoscendo solo il seed.
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        self.outcome = random.Random(seed * 2)
+        self.cosmetic = random.Random(seed * 2 + 1)
+
+
+def choose_dive(rng=random):
+    # 95% di probabilità che il portiere si muova, 5% che resti fermo
+    if rng.random() < KEEPER_MOVE_PROB:
+        return rng.choice((DIVE_LEFT, DIVE_RIGHT))
+    return DIVE_STAY
+
+
+def dive_target(dive, keeper_center):
+    return (keeper_center[0] + DIVE_OFFSETS[dive], keeper_center[1])
+
+
+def place_bet(balance, current_bet, chip_value):
+    # Restituisce (saldo, puntata) dopo aver aggiunto la fiche, None se il saldo non basta
+    if balance < chip_value:
+        return None
+    return balance - chip_value, current_bet + chip_value
+
+
+def cancel_bet(balance, current_bet):
+    return balance + current_bet, 0
+
+
+def goal_payout(bet, goal_multiplier=GOAL_MULTIPLIER):
+    return int(bet * goal_multiplier)
+
+
+def save_penalty(bet, penalty_multiplier=PENALTY_MULTIPLIER):
+    return int(bet * penalty_multiplier)
+
+
+def settle_shot(balance, bet, saved, goal_multiplier=GOAL_MULTIPLIER,
+                penalty_multiplier=PENALTY_MULTIPLIER):
+    # Restituisce (nuovo saldo, variazione, game over)
+    if saved:
+        delta = -save_penalty(bet, penalty_multiplier)
+    else:
+        delta = goal_payout(bet, goal_multiplier)
+    balance += delta
+    return balance, delta, balance <= 0
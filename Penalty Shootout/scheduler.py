@@ -0,0 +1,87 @@
+# Scheduler adattivo per le schermate ferme: se la schermata corrente non ha
+# animazioni in corso (is_animating), invece di girare a FPS il loop si
+# blocca su pygame.event.wait finché non arriva un input o scade il timeout.
+# Il primo evento ricevuto riporta subito il loop al frame rate pieno.
+# Le schermate sempre animate (le particelle del menu) non si fermano mai:
+# dopo ATTRACT_DELAY secondi senza input girano ad ATTRACT_FPS, come un
+# chiosco in modalità attrazione, finché non arriva un input.
+import time
+
+import pygame
+
+IDLE_TIMEOUT = 1000  # ms
+ATTRACT_DELAY = 30.0  # secondi senza input prima di rallentare
+ATTRACT_FPS = 15
+
+# Gli unici eventi usati dalle schermate (più l'esposizione della finestra,
+# che chiede un ridisegno): gli altri non svegliano il loop
+ALLOWED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN,
+                  pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN)
+
+
+class IdleScheduler:
+    def __init__(self, enabled=True, timeout=IDLE_TIMEOUT, attract_delay=ATTRACT_DELAY,
+                 attract_fps=ATTRACT_FPS):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.attract_delay = attract_delay
+        self.attract_fps = attract_fps
+        self.last_input = time.perf_counter()
+        self.attract_frames = 0
+        self.pending = []
+        self.waits = 0
+        self.timeouts = 0
+        self.idle_time = 0.0
+
+    def install(self):
+        # Solo con lo scheduler attivo: altrimenti la coda resta com'è
+        if not self.enabled:
+            return
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+
+    def should_wait(self, scene):
+        return self.enabled and not scene.is_animating()
+
+    def wait(self):
+        # Blocca fino al prossimo evento; False se è scaduto il timeout
+        start = time.perf_counter()
+        event = pygame.event.wait(self.timeout)
+        self.idle_time += time.perf_counter() - start
+        self.waits += 1
+        if event.type == pygame.NOEVENT:
+            self.timeouts += 1
+            return False
+        self.pending.append(event)
+        return True
+
+    def get(self):
+        # Eventi del frame, compreso quello che ha svegliato il loop
+        events = pygame.event.get()
+        if self.pending:
+            events = self.pending + events
+            self.pending = []
+        if any(event.type in INPUT_EVENTS for event in events):
+            self.last_input = time.perf_counter()
+        return events
+
+    def frame_rate(self, fps):
+        # Frame rate del prossimo frame: ridotto in modalità attrazione
+        if (self.enabled and self.attract_delay
+                and time.perf_counter() - self.last_input >= self.attract_delay
+                and (fps == 0 or fps > self.attract_fps)):
+            self.attract_frames += 1
+            return self.attract_fps
+        return fps
+
+    def stats(self):
+        # Attese dell'input (e quante scadute), tempo passato ad aspettare e
+        # frame girati in modalità attrazione
+        return {"waits": self.waits, "timeouts": self.timeouts, "idle_s": self.idle_time,
+                "attract": self.attract_frames}
+
+    @staticmethod
+    def exposed(events):
+        return any(event.type in EXPOSE_EVENTS for event in events)
@@ -0,0 +1,378 @@
+# Server asyncio con molti tavoli indipendenti nello stesso processo. Ogni
+# sessione ha saldo, puntata e GameRNG propri e segue le stesse regole di
+# BettingScreen e PenaltyGame.check_shot_result (rules.py), senza pygame.
+#
+# Protocollo: una richiesta JSON per riga, una risposta JSON per riga con lo
+# stesso "id". Su una connessione si possono avere più richieste in volo.
+#   {"id": 1, "op": "open", "seed": 42}          -> {"id": 1, "session": 7, "balance": 1600}
+#   (il saldo iniziale è sempre STARTING_BALANCE; le sessioni si chiudono
+#   anche quando si chiude la connessione che le ha aperte)
+#   {"id": 2, "op": "chip", "session": 7, "value": 100}
+#   {"id": 3, "op": "cancel", "session": 7}
+#   {"id": 4, "op": "start", "session": 7}        (blocca la puntata, come PUNTA)
+#   {"id": 5, "op": "shoot", "session": 7, "target": 2}
+#   {"id": 6, "op": "cash_out", "session": 7}
+#   {"id": 7, "op": "close", "session": 7}
+#   {"id": 8, "op": "stats"}                      (anche "session" per una sola)
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+from rules import (BALL_SIZE, KEEPER_SIZE, CHIP_VALUES, STARTING_BALANCE,
+                   TARGET_POSITIONS, GameRNG, outcome_table, choose_dive,
+                   place_bet, cancel_bet, settle_shot)
+
+HOST = "127.0.0.1"
+PORT = 8765
+# Campioni di latenza tenuti per sessione e in totale
+SESSION_SAMPLES = 1024
+TOTAL_SAMPLES = 1 << 16
+
+
+class RequestError(Exception):
+    pass
+
+
+def int_field(request, name):
+    value = request.get(name)
+    # bool è una sottoclasse di int, ma true non è una fiche
+    if type(value) is not int:
+        raise RequestError(f"{name} deve essere un intero")
+    return value
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(samples):
+    # Millisecondi
+    return {"p50": percentile(samples, 0.50) * 1000, "p99": percentile(samples, 0.99) * 1000}
+
+
+class Session:
+    def __init__(self, session_id, seed=None, balance=STARTING_BALANCE):
+        self.id = session_id
+        self.rng = GameRNG(seed)
+        self.balance = balance
+        self.current_bet = 0
+        # Puntata bloccata dopo "start"; None mentre si punta
+        self.bet_amount = None
+        self.game_over = False
+        self.requests = 0
+        self.shots = 0
+        self.goals = 0
+        self.saves = 0
+        self.opened = time.perf_counter()
+        self.latencies = deque(maxlen=SESSION_SAMPLES)
+
+    def chip(self, value):
+        if self.bet_amount is not None:
+            raise RequestError("partita in corso")
+        if value not in CHIP_VALUES:
+            raise RequestError(f"fiche non valida: {value}")
+        bet = place_bet(self.balance, self.current_bet, value)
+        if bet is None:
+            raise RequestError("saldo insufficiente")
+        self.balance, self.current_bet = bet
+
+    def cancel(self):
+        if self.bet_amount is not None:
+            raise RequestError("partita in corso")
+        self.balance, self.current_bet = cancel_bet(self.balance, self.current_bet)
+
+    def start(self):
+        if self.bet_amount is not None:
+            raise RequestError("partita in corso")
+        if self.current_bet <= 0:
+            raise RequestError("nessuna puntata")
+        self.bet_amount, self.current_bet = self.current_bet, 0
+        self.game_over = False
+
+    def shoot(self, target, outcomes):
+        if self.bet_amount is None or self.game_over:
+            raise RequestError("nessuna partita in corso")
+        if not 0 <= target < len(TARGET_POSITIONS):
+            raise RequestError(f"bersaglio non valido: {target}")
+        dive = choose_dive(self.rng.outcome)
+        saved = outcomes[target][dive]
+        self.balance, delta, self.game_over = settle_shot(self.balance, self.bet_amount, saved)
+        self.shots += 1
+        if saved:
+            self.saves += 1
+        else:
+            self.goals += 1
+        return {"saved": saved, "dive": dive, "delta": delta, "game_over": self.game_over}
+
+    def cash_out(self):
+        if self.bet_amount is None:
+            raise RequestError("nessuna partita in corso")
+        self.bet_amount = None
+        self.game_over = False
+
+    def state(self):
+        return {"session": self.id, "balance": self.balance, "current_bet": self.current_bet,
+                "bet": self.bet_amount, "game_over": self.game_over}
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.opened
+        return {"session": self.id, "balance": self.balance, "requests": self.requests,
+                "shots": self.shots, "goals": self.goals, "saves": self.saves,
+                "shots_per_s": self.shots / elapsed if elapsed else 0.0,
+                "latency_ms": latency_summary(self.latencies)}
+
+
+class SessionServer:
+    def __init__(self, ball_size=BALL_SIZE, keeper_size=KEEPER_SIZE):
+        self.outcomes = outcome_table(ball_size, keeper_size)
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.errors = 0
+        self.shots = 0
+        self.connections = 0
+        self.latencies = deque(maxlen=TOTAL_SAMPLES)
+        self.started = time.perf_counter()
+        self.last_report = (self.started, 0, 0)
+
+    def session(self, request):
+        session = self.sessions.get(int_field(request, "session"))
+        if session is None:
+            raise RequestError("sessione sconosciuta")
+        return session
+
+    def dispatch(self, request, owned=None):
+        # owned: sessioni aperte dalla connessione, chiuse quando si chiude
+        op = request.get("op")
+        if op == "open":
+            if "balance" in request:
+                raise RequestError(f"il saldo iniziale è sempre {STARTING_BALANCE}")
+            seed = int_field(request, "seed") if request.get("seed") is not None else None
+            session = Session(next(self.ids), seed)
+            self.sessions[session.id] = session
+            if owned is not None:
+                owned.add(session.id)
+            return session, session.state()
+        if op == "stats":
+            if "session" in request:
+                return None, self.session(request).stats()
+            return None, self.stats()
+
+        session = self.session(request)
+        if op == "chip":
+            session.chip(int_field(request, "value"))
+        elif op == "cancel":
+            session.cancel()
+        elif op == "start":
+            session.start()
+        elif op == "shoot":
+            result = session.shoot(int_field(request, "target"), self.outcomes)
+            self.shots += 1
+            return session, dict(session.state(), **result)
+        elif op == "cash_out":
+            session.cash_out()
+        elif op == "close":
+            del self.sessions[session.id]
+            if owned is not None:
+                owned.discard(session.id)
+            return None, session.stats()
+        else:
+            raise RequestError(f"operazione sconosciuta: {op}")
+        return session, session.state()
+
+    def handle_line(self, line, owned=None):
+        start = time.perf_counter()
+        request_id = None
+        session = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("la richiesta deve essere un oggetto JSON")
+            request_id = request.get("id")
+            session, response = self.dispatch(request, owned)
+        except (ValueError, RequestError) as e:
+            self.errors += 1
+            response = {"error": str(e)}
+        except Exception as e:
+            # Un errore imprevisto non deve chiudere la connessione, che
+            # porta anche le altre sessioni del client
+            self.errors += 1
+            response = {"error": f"errore interno: {type(e).__name__}: {e}"}
+        response["id"] = request_id
+
+        latency = time.perf_counter() - start
+        self.requests += 1
+        self.latencies.append(latency)
+        if session is not None:
+            session.requests += 1
+            session.latencies.append(latency)
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(self.handle_line(line, owned))
+                # Si aspetta il client solo se il buffer di uscita è pieno
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            # Le sessioni della connessione non sono più raggiungibili da
+            # chi le ha aperte: si liberano
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    def stats(self):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        return {"sessions": len(self.sessions), "connections": self.connections,
+                "requests": self.requests, "errors": self.errors, "shots": self.shots,
+                "requests_per_s": self.requests / elapsed if elapsed else 0.0,
+                "shots_per_s": self.shots / elapsed if elapsed else 0.0,
+                "latency_ms": latency_summary(self.latencies)}
+
+    def report(self):
+        now = time.perf_counter()
+        last_time, last_requests, last_shots = self.last_report
+        self.last_report = (now, self.requests, self.shots)
+        elapsed = now - last_time
+        latency = latency_summary(self.latencies)
+        print(f"sessioni {len(self.sessions)}  connessioni {self.connections}  "
+              f"richieste/s {(self.requests - last_requests) / elapsed:.0f}  "
+              f"tiri/s {(self.shots - last_shots) / elapsed:.0f}  "
+              f"p50 {latency['p50']:.3f} ms  p99 {latency['p99']:.3f} ms", flush=True)
+
+    async def serve(self, host=HOST, port=PORT, report_interval=5.0):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=1 << 20)
+        print(f"In ascolto su {host}:{port}", flush=True)
+        async with server:
+            if report_interval:
+                while True:
+                    await asyncio.sleep(report_interval)
+                    self.report()
+            else:
+                await server.serve_forever()
+
+
+class LoadClient:
+    # Client di carico: più sessioni in parallelo sulla stessa connessione,
+    # con le risposte smistate in base a "id"
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.latencies = []
+        self.listener = asyncio.ensure_future(self.listen())
+
+    async def listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.pending.pop(response["id"], None)
+            if future:
+                future.set_result(response)
+
+    async def request(self, op, **fields):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        start = time.perf_counter()
+        self.writer.write(json.dumps(dict(fields, id=request_id, op=op)).encode() + b"\n")
+        response = await future
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+    async def play(self, rng, shots, bet):
+        session = (await self.request("open", seed=rng.getrandbits(32)))["session"]
+        played = 0
+        while played < shots:
+            await self.request("chip", session=session, value=bet)
+            if "error" in await self.request("start", session=session):
+                break
+            response = {}
+            while played < shots and not response.get("game_over"):
+                response = await self.request("shoot", session=session,
+                                              target=rng.randrange(len(TARGET_POSITIONS)))
+                played += 1
+            if response.get("game_over"):
+                break
+            await self.request("cash_out", session=session)
+        return await self.request("close", session=session)
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+
+
+async def run_load(host, port, sessions, connections, shots, bet, seed):
+    rng = random.Random(seed)
+    clients = []
+    for _ in range(connections):
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        clients.append(LoadClient(reader, writer))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        clients[i % connections].play(random.Random(rng.getrandbits(64)), shots, bet)
+        for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [t for client in clients for t in client.latencies]
+    for client in clients:
+        await client.close()
+
+    total_shots = sum(r["shots"] for r in results)
+    latency = latency_summary(latencies)
+    print(f"Sessioni: {sessions}  Connessioni: {connections}  Tiri: {total_shots}  "
+          f"Richieste: {len(latencies)}  Tempo: {elapsed:.2f} s")
+    print(f"Richieste/s: {len(latencies) / elapsed:.0f}  Tiri/s: {total_shots / elapsed:.0f}")
+    print(f"Latenza andata e ritorno: p50 {latency['p50']:.3f} ms  p99 {latency['p99']:.3f} ms")
+    session_p99 = sorted(r["latency_ms"]["p99"] for r in results)
+    print(f"p99 lato server per sessione: mediana {percentile(session_p99, 0.5):.3f} ms  "
+          f"peggiore {session_p99[-1]:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server multi-tavolo dei rigori")
+    parser.add_argument("mode", choices=("serve", "load"))
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="secondi tra due righe di statistiche del server (0 = nessuna)")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--shots", type=int, default=100, help="tiri per sessione")
+    parser.add_argument("--bet", type=int, default=10, choices=CHIP_VALUES)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        if args.mode == "serve":
+            asyncio.run(SessionServer().serve(args.host, args.port, args.report_interval))
+        else:
+            asyncio.run(run_load(args.host, args.port, args.sessions, args.connections,
+                                 args.shots, args.bet, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Simulazione headless e vettorizzata dei tiri, per verificare il margine
+# del banco su milioni di tiri senza finestra né loop di eventi pygame.
+import argparse
+import time
+
+import numpy as np
+
+from rules import (BALL_SIZE, KEEPER_SIZE, GOAL_MULTIPLIER, PENALTY_MULTIPLIER,
+                   STARTING_BALANCE, KEEPER_MOVE_PROB, TARGET_POSITIONS,
+                   DIVE_STAY, DIVE_LEFT, outcome_table, goal_payout, save_penalty)
+
+CHUNK_SIZE = 1 << 20
+
+
+class ShotSimulator:
+    def __init__(self, ball_size=BALL_SIZE, keeper_size=KEEPER_SIZE,
+                 goal_multiplier=GOAL_MULTIPLIER, penalty_multiplier=PENALTY_MULTIPLIER,
+                 seed=None):
+        self.goal_multiplier = goal_multiplier
+        self.penalty_multiplier = penalty_multiplier
+        self.rng = np.random.default_rng(seed)
+
+        # saved[bersaglio, tuffo]: True se il portiere para
+        self.saved = np.array(outcome_table(ball_size, keeper_size), dtype=bool)
+
+    def sample_dives(self, n):
+        # Stessa logica di reset_keeper: 95% tuffo (sinistra/destra 50/50), 5% fermo
+        moves = self.rng.random(n) < KEEPER_MOVE_PROB
+        sides = self.rng.integers(0, 2, n, dtype=np.int8) + DIVE_LEFT
+        return np.where(moves, sides, np.int8(DIVE_STAY))
+
+    def sample_targets(self, n):
+        return self.rng.integers(0, len(TARGET_POSITIONS), n, dtype=np.int8)
+
+    def outcomes(self, targets, dives):
+        # True = gol, False = parata
+        return ~self.saved[targets, dives]
+
+    def simulate_shots(self, n, targets=None):
+        goals = 0
+        done = 0
+        while done < n:
+            size = min(CHUNK_SIZE, n - done)
+            t = self.sample_targets(size) if targets is None else np.broadcast_to(targets, size)
+            goals += int(np.count_nonzero(self.outcomes(t, self.sample_dives(size))))
+            done += size
+        return {"shots": n, "goals": goals, "saves": n - goals}
+
+    def simulate_sessions(self, n_sessions, n_shots, bet, balance=STARTING_BALANCE, targets=None):
+        # Una sessione è una PenaltyGame: la puntata si scala una volta sola
+        # in BettingScreen, poi ogni tiro vale +goal_payout o -save_penalty
+        # finché il saldo non arriva a zero (game over)
+        shape = (n_sessions, n_shots)
+        t = self.sample_targets(shape) if targets is None else np.broadcast_to(targets, shape)
+        dives = self.sample_dives(n_sessions * n_shots).reshape(shape)
+        goals = self.outcomes(t, dives)
+
+        win = goal_payout(bet, self.goal_multiplier)
+        loss = save_penalty(bet, self.penalty_multiplier)
+        deltas = np.where(goals, win, -loss).astype(np.int64)
+
+        trajectories = np.empty((n_sessions, n_shots + 1), dtype=np.int64)
+        trajectories[:, 0] = balance - bet
+        np.cumsum(deltas, axis=1, out=trajectories[:, 1:])
+        trajectories[:, 1:] += balance - bet
+
+        # Dopo il game over il saldo resta fermo
+        ruined = trajectories[:, 1:] <= 0
+        any_ruin = ruined.any(axis=1)
+        lengths = np.where(any_ruin, ruined.argmax(axis=1) + 1, n_shots)
+        cols = np.arange(n_shots + 1)
+        frozen = cols[None, :] > lengths[:, None]
+        final = trajectories[np.arange(n_sessions), lengths]
+        trajectories = np.where(frozen, final[:, None], trajectories)
+
+        played = cols[None, 1:] <= lengths[:, None]
+        return {
+            "balances": trajectories,
+            "lengths": lengths,
+            "ruined": any_ruin,
+            "goals": int(np.count_nonzero(goals & played)),
+            "saves": int(np.count_nonzero(~goals & played)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulazione headless dei rigori")
+    parser.add_argument("--shots", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=0)
+    parser.add_argument("--session-shots", type=int, default=100)
+    parser.add_argument("--bet", type=int, default=100)
+    parser.add_argument("--balance", type=int, default=STARTING_BALANCE)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sim = ShotSimulator(seed=args.seed)
+    start = time.perf_counter()
+    result = sim.simulate_shots(args.shots)
+    elapsed = time.perf_counter() - start
+    print(f"Tiri: {result['shots']}  Gol: {result['goals']}  Parate: {result['saves']}")
+    print(f"Percentuale gol: {result['goals'] / max(1, result['shots']):.4%}")
+    print(f"Velocità: {result['shots'] / elapsed / 1e6:.1f} milioni di tiri/s")
+
+    if args.sessions:
+        sessions = sim.simulate_sessions(args.sessions, args.session_shots, args.bet, args.balance)
+        final = sessions["balances"][:, -1]
+        print(f"Sessioni: {args.sessions}  Rovina: {sessions['ruined'].mean():.2%}  "
+              f"Saldo finale medio: ${final.mean():.2f}  Durata media: {sessions['lengths'].mean():.1f} tiri")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# Soak test del gioco vero: rigori.main gira senza limite di frame con i
+# driver SDL dummy e un bot che, a ogni frame, inietta nella coda gli eventi
+# che un giocatore produrrebbe (menu -> puntata -> tiri -> ritiro o game
+# over -> di nuovo). Quando il saldo finisce la sessione si chiude e ne
+# riparte un'altra nello stesso processo. A intervalli regolari si misurano
+# RSS, oggetti vivi e tempo medio di frame: se crescono oltre le soglie
+# rispetto all'inizio l'esecuzione fallisce.
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import rigori
+from benchmarks import ScriptedInput
+from rules import CHIP_VALUES
+
+DURATION = 60.0          # secondi
+INTERVAL = 5.0           # secondi tra due campioni
+WARMUP = 10.0            # secondi prima del campione di riferimento
+MAX_RSS_GROWTH = 32.0    # MiB
+MAX_OBJECT_GROWTH = 0.10
+MAX_FRAME_DRIFT = 0.25
+CASH_OUT_AFTER = 5       # tiri per partita prima di ritirarsi (0 = mai)
+
+
+# Strategie di puntata: indici delle fiche da cliccare dato il saldo
+
+def bet_min(balance, rng):
+    return [0] if balance >= CHIP_VALUES[0] else []
+
+
+def bet_random(balance, rng):
+    chips = []
+    for _ in range(rng.randint(1, 5)):
+        affordable = [i for i, value in enumerate(CHIP_VALUES) if value <= balance]
+        if not affordable:
+            break
+        i = rng.choice(affordable)
+        chips.append(i)
+        balance -= CHIP_VALUES[i]
+    return chips
+
+
+def bet_all_in(balance, rng):
+    chips = []
+    for i in reversed(range(len(CHIP_VALUES))):
+        while CHIP_VALUES[i] <= balance:
+            chips.append(i)
+            balance -= CHIP_VALUES[i]
+    return chips
+
+
+BET_STRATEGIES = {"min": bet_min, "random": bet_random, "all_in": bet_all_in}
+
+# Strategie di tiro: indice del bersaglio dato il numero di tiri fatti
+SHOT_STRATEGIES = {
+    "random": lambda shots, count, rng: rng.randrange(count),
+    "cycle": lambda shots, count, rng: shots % count,
+    "same": lambda shots, count, rng: 0,
+}
+
+
+def rss_mb():
+    # RSS attuale da /proc; altrove solo il picco di getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+class SoakMonitor:
+    def __init__(self, interval=INTERVAL, warmup=WARMUP, log_path=None):
+        self.interval = interval
+        self.warmup = warmup
+        self.start = time.perf_counter()
+        self.last_frame = None
+        self.last_sample = self.start
+        self.frame_times = []
+        self.frames = 0
+        self.sessions = 0
+        self.samples = []
+        self.log = open(log_path, "a") if log_path else None
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def resume(self):
+        # Nuova sessione: l'avvio del gioco non è un frame
+        self.last_frame = None
+
+    def frame(self):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+        self.frames += 1
+        if now - self.last_sample >= self.interval:
+            self.sample()
+            # Il campione (gc compreso) non entra nel tempo del frame
+            self.last_frame = self.last_sample = time.perf_counter()
+
+    def sample(self):
+        gc.collect()
+        times = sorted(self.frame_times)
+        n = len(times)
+        sample = {"t": round(self.elapsed(), 3), "frames": self.frames, "sessions": self.sessions,
+                  "rss_mb": round(rss_mb(), 2), "objects": len(gc.get_objects()),
+                  "frame_ms": sum(times) / n * 1000 if n else 0.0,
+                  "frame_p95_ms": times[min(n - 1, int(n * 0.95))] * 1000 if n else 0.0,
+                  "warmup": self.elapsed() < self.warmup}
+        self.frame_times = []
+        self.samples.append(sample)
+        if self.log:
+            self.log.write(json.dumps(sample) + "\n")
+            self.log.flush()
+        print(f"{sample['t']:8.1f}s  frame {sample['frame_ms']:6.3f} ms  p95 {sample['frame_p95_ms']:6.3f} ms  "
+              f"RSS {sample['rss_mb']:7.1f} MiB  oggetti {sample['objects']:7d}  "
+              f"sessioni {sample['sessions']}", flush=True)
+
+    def check(self, max_rss_growth=MAX_RSS_GROWTH, max_object_growth=MAX_OBJECT_GROWTH,
+              max_frame_drift=MAX_FRAME_DRIFT):
+        # Inizio e fine si confrontano sulla mediana di (fino a) tre campioni
+        samples = [s for s in self.samples if not s["warmup"]]
+        if len(samples) < 2:
+            print("Troppo pochi campioni dopo il riscaldamento: nessun controllo")
+            return []
+        k = min(3, len(samples) // 2)
+        first, last = samples[:k], samples[-k:]
+        rss = median([s["rss_mb"] for s in last]) - median([s["rss_mb"] for s in first])
+        objects = median([s["objects"] for s in first])
+        object_growth = (median([s["objects"] for s in last]) - objects) / objects
+        frame = median([s["frame_ms"] for s in first])
+        drift = (median([s["frame_ms"] for s in last]) - frame) / frame if frame else 0.0
+        print(f"Crescita: RSS {rss:+.1f} MiB  oggetti {object_growth:+.1%}  tempo di frame {drift:+.1%}")
+
+        failures = []
+        if rss > max_rss_growth:
+            failures.append(f"RSS cresciuta di {rss:.1f} MiB (massimo {max_rss_growth})")
+        if object_growth > max_object_growth:
+            failures.append(f"oggetti vivi cresciuti del {object_growth:.1%} (massimo {max_object_growth:.0%})")
+        if drift > max_frame_drift:
+            failures.append(f"tempo di frame cresciuto del {drift:.1%} (massimo {max_frame_drift:.0%})")
+        return failures
+
+    def close(self):
+        if self.log:
+            self.log.close()
+
+
+class SoakBot:
+    # Chiamato da rigori.main all'inizio di ogni frame con la schermata
+    # corrente; posta gli eventi che quel frame leggerà
+    def __init__(self, monitor, bet="random", shoot="random", cash_out_after=CASH_OUT_AFTER,
+                 duration=DURATION, seed=0):
+        self.monitor = monitor
+        self.bet = BET_STRATEGIES[bet]
+        self.shoot = SHOT_STRATEGIES[shoot]
+        self.cash_out_after = cash_out_after
+        self.duration = duration
+        self.rng = random.Random(seed)
+        self.inp = ScriptedInput()
+        self.plan = None
+        self.shots = 0
+        self.broke = False
+        self.games = 0
+
+    def step(self, current_screen, scene):
+        self.monitor.frame()
+        if self.monitor.elapsed() >= self.duration or self.broke:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+        elif current_screen == "main_menu":
+            self.inp.move(scene.play_button.rect.center)
+            self.inp.click(scene.play_button.rect.center)
+        elif current_screen == "betting_screen":
+            self.betting(scene)
+        else:
+            self.playing(scene)
+
+    def betting(self, screen):
+        if self.plan is None:
+            self.plan = self.bet(screen.balance, self.rng)
+            if not self.plan and not screen.current_bet:
+                # Saldo finito: si chiude la sessione e ne parte un'altra
+                self.broke = True
+                return
+        if self.plan:
+            chip = screen.chips[self.plan.pop()]
+            self.inp.click((chip.x, chip.y))
+        else:
+            self.plan = None
+            self.shots = 0
+            self.games += 1
+            self.inp.move(screen.bet_button.rect.center)
+            self.inp.click(screen.bet_button.rect.center)
+
+    def playing(self, game):
+        if game.game_over or game.result_text:
+            self.inp.key()
+        elif not game.ball_moving:
+            if self.cash_out_after and self.shots >= self.cash_out_after:
+                self.inp.move(game.cash_out_button.rect.center)
+                self.inp.click(game.cash_out_button.rect.center)
+            else:
+                targets = game.target_positions
+                self.inp.click(targets[self.shoot(self.shots, len(targets), self.rng)])
+                self.shots += 1
+        else:
+            # Palla in volo: il mouse si muove, come farebbe un giocatore
+            self.inp.move((self.rng.randrange(rigori.WIDTH), self.rng.randrange(rigori.HEIGHT)))
+
+
+def run(duration=DURATION, bet="random", shoot="random", cash_out_after=CASH_OUT_AFTER,
+        seed=0, interval=INTERVAL, warmup=WARMUP, log_path=None, dirty_rects=False):
+    monitor = SoakMonitor(interval, warmup, log_path)
+    bot = SoakBot(monitor, bet, shoot, cash_out_after, duration, seed)
+    try:
+        while monitor.elapsed() < duration:
+            monitor.sessions += 1
+            monitor.resume()
+            bot.broke = False
+            try:
+                # Nessun limite di frame, un passo di fisica per frame
+                rigori.main(dirty_rects=dirty_rects, fps=0, fast_forward=True,
+                            seed=seed + monitor.sessions, idle=False, bot=bot)
+            except SystemExit:
+                pass
+    finally:
+        monitor.close()
+    return monitor, bot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test senza finestra del gioco completo")
+    parser.add_argument("--duration", type=float, default=DURATION, help="durata in secondi")
+    parser.add_argument("--bet", choices=sorted(BET_STRATEGIES), default="random")
+    parser.add_argument("--shoot", choices=sorted(SHOT_STRATEGIES), default="random")
+    parser.add_argument("--cash-out-after", type=int, default=CASH_OUT_AFTER,
+                        help="tiri per partita prima del ritiro (0 = fino al game over)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="secondi tra due campioni")
+    parser.add_argument("--warmup", type=float, default=WARMUP,
+                        help="secondi esclusi dal confronto (cache, JIT dei driver...)")
+    parser.add_argument("--log", default=None, help="scrive i campioni in JSON, uno per riga")
+    parser.add_argument("--dirty-rects", action="store_true")
+    parser.add_argument("--max-rss-growth", type=float, default=MAX_RSS_GROWTH, help="MiB")
+    parser.add_argument("--max-object-growth", type=float, default=MAX_OBJECT_GROWTH,
+                        help="crescita relativa degli oggetti vivi (0.1 = 10%%)")
+    parser.add_argument("--max-frame-drift", type=float, default=MAX_FRAME_DRIFT,
+                        help="crescita relativa del tempo medio di frame")
+    args = parser.parse_args()
+
+    monitor, bot = run(args.duration, args.bet, args.shoot, args.cash_out_after, args.seed,
+                       args.interval, args.warmup, args.log, args.dirty_rects)
+    print(f"{monitor.frames} frame, {bot.games} partite, {monitor.sessions} sessioni "
+          f"in {monitor.elapsed():.1f} s")
+    failures = monitor.check(args.max_rss_growth, args.max_object_growth, args.max_frame_drift)
+    for failure in failures:
+        print(f"FALLITO: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Superfici prerenderizzate e condivise tra i frame e tra le istanze delle
+# schermate. Tutte le superfici del gioco passano da new_surface(), così il
+# contatore surface_allocations dimostra che a regime un frame non alloca.
+# Con una scala di rendering minore di 1 new_surface() restituisce una
+# ScaledSurface: dimensioni logiche, pixel ridotti.
+import pygame
+
+import render_scale
+from render_scale import ScaledSurface, draw_circle
+
+WHITE = (255, 255, 255)
+TARGET_RADIUS = 30
+
+surface_allocations = 0
+_sprites = {}
+
+
+def new_surface(size, flags=0, *args):
+    global surface_allocations
+    surface_allocations += 1
+    if render_scale.scale == 1:
+        return pygame.Surface(size, flags, *args)
+    args = [arg.surface if isinstance(arg, ScaledSurface) else arg for arg in args]
+    return ScaledSurface(pygame.Surface(render_scale.pixels(size), flags, *args), render_scale.scale, size)
+
+
+def _cached(key, build):
+    sprite = _sprites.get(key)
+    if sprite is None:
+        sprite = _sprites[key] = build()
+    return sprite
+
+
+def target_sprite(selected=False):
+    def build():
+        size = TARGET_RADIUS * 2
+        surf = new_surface((size, size), pygame.SRCALPHA)
+        center = (TARGET_RADIUS, TARGET_RADIUS)
+        draw_circle(surf, (255, 255, 255, 50), center, TARGET_RADIUS)
+        draw_circle(surf, WHITE, center, TARGET_RADIUS, 2)
+        if selected:
+            draw_circle(surf, (255, 215, 0, 150), center, TARGET_RADIUS + 5, 5)
+        return surf
+    return _cached(("target", selected), build)
+
+
+def overlay_sprite(size, color=(0, 0, 0, 200)):
+    def build():
+        surf = new_surface(size, pygame.SRCALPHA)
+        surf.fill(color)
+        return surf
+    return _cached(("overlay", tuple(size), color), build)
+
+
+def layer_surface(name, size, like):
+    # Superficie a schermo intero riusata da tutte le istanze della stessa
+    # schermata: chi la usa la ridisegna quando il suo stato cambia
+    return _cached(("layer", name, tuple(size)), lambda: new_surface(size, 0, like))
+
+
+def clear_sprites():
+    _sprites.clear()
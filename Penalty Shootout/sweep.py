@@ -0,0 +1,172 @@
+# Sweep parallelo dei moltiplicatori: per ogni combinazione di
+# goal_multiplier, penalty_multiplier, saldo iniziale e puntata stima
+# rendimento atteso, probabilità di rovina e durata delle sessioni.
+#
+# Ogni cella ha un seed derivato dal suo indice nella griglia, quindi i
+# risultati non dipendono dal numero di processi. Le righe vengono scritte
+# man mano che le celle finiscono: rilanciando con lo stesso --output le
+# celle già presenti con gli stessi parametri (moltiplicatori, saldo,
+# puntata, sessioni, tiri massimi e seed) vengono saltate; le righe di altri
+# parametri restano nel file ma non contano.
+import argparse
+import csv
+import itertools
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from rules import GOAL_MULTIPLIER, PENALTY_MULTIPLIER, STARTING_BALANCE, CHIP_VALUES
+from simulation import ShotSimulator
+
+# Campi che identificano una cella: una riga vale solo per questi valori
+KEY_FIELDS = [
+    "cell", "goal_multiplier", "penalty_multiplier", "balance", "bet", "sessions", "max_shots", "seed",
+]
+FIELDS = KEY_FIELDS + [
+    "expected_return", "return_std", "ruin_probability", "goal_rate",
+    "mean_length", "p50_length", "p90_length", "p99_length",
+]
+FLOAT_KEYS = {"goal_multiplier", "penalty_multiplier"}
+SESSION_BLOCK = 10_000
+
+
+def parse_values(text, cast=float):
+    # "1.5" , "1.2,1.5,2" oppure "inizio:fine:passo" (fine inclusa)
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [cast(round(start + i * step, 10)) for i in range(count)]
+    return [cast(v) for v in text.split(",")]
+
+
+def build_grid(goal_multipliers, penalty_multipliers, balances, bets):
+    cells = itertools.product(goal_multipliers, penalty_multipliers, balances, bets)
+    # Come in BettingScreen, non si può puntare più del saldo
+    return [(i, cell) for i, cell in enumerate(c for c in cells if c[3] <= c[2])]
+
+
+def run_cell(job):
+    index, (goal_multiplier, penalty_multiplier, balance, bet), sessions, max_shots, seed = job
+    sim = ShotSimulator(goal_multiplier=goal_multiplier, penalty_multiplier=penalty_multiplier,
+                        seed=np.random.SeedSequence(seed, spawn_key=(index,)))
+
+    finals = []
+    lengths = []
+    goals = shots = ruined = 0
+    for done in range(0, sessions, SESSION_BLOCK):
+        result = sim.simulate_sessions(min(SESSION_BLOCK, sessions - done), max_shots, bet, balance)
+        finals.append(result["balances"][:, -1])
+        lengths.append(result["lengths"])
+        ruined += int(np.count_nonzero(result["ruined"]))
+        goals += result["goals"]
+        shots += result["goals"] + result["saves"]
+
+    returns = np.concatenate(finals) - balance
+    lengths = np.concatenate(lengths)
+    p50, p90, p99 = np.percentile(lengths, [50, 90, 99])
+    return {
+        "cell": index,
+        "goal_multiplier": goal_multiplier,
+        "penalty_multiplier": penalty_multiplier,
+        "balance": balance,
+        "bet": bet,
+        "sessions": sessions,
+        "max_shots": max_shots,
+        "seed": seed,
+        "expected_return": returns.mean(),
+        "return_std": returns.std(),
+        "ruin_probability": ruined / sessions,
+        "goal_rate": goals / max(1, shots),
+        "mean_length": lengths.mean(),
+        "p50_length": p50,
+        "p90_length": p90,
+        "p99_length": p99,
+    }
+
+
+def cell_key(index, cell, sessions, max_shots, seed):
+    # Gli stessi valori di KEY_FIELDS, con i tipi letti da row_key
+    goal_multiplier, penalty_multiplier, balance, bet = cell
+    return (index, float(goal_multiplier), float(penalty_multiplier), balance, bet,
+            sessions, max_shots, seed)
+
+
+def row_key(line):
+    # Chiave della cella se la riga è completa: terminata dall'a capo e con
+    # tutti i campi numerici; None altrimenti
+    if not line.endswith("\n"):
+        return None
+    values = next(csv.reader([line]), [])
+    if len(values) != len(FIELDS):
+        return None
+    try:
+        for v in values[len(KEY_FIELDS):]:
+            float(v)
+        return tuple(float(v) if name in FLOAT_KEYS else int(v) for name, v in zip(KEY_FIELDS, values))
+    except ValueError:
+        return None
+
+
+def completed_cells(path):
+    # Un'interruzione può lasciare l'ultima riga a metà, anche dentro
+    # l'ultimo campo: il file si riscrive con le sole righe complete (una per
+    # chiave), così le celle rilanciate non restano accanto a quelle troncate
+    lines = []
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            lines = f.read().splitlines(keepends=True)
+    if lines and next(csv.reader([lines[0]]), []) != FIELDS:
+        # Un altro formato: meglio fermarsi che riscriverlo perdendo le righe
+        raise ValueError(f"{path} non è un'uscita di questo sweep (intestazione diversa)")
+    rows = {}
+    for line in lines[1:]:
+        key = row_key(line)
+        if key is not None:
+            rows.setdefault(key, line)
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        csv.DictWriter(f, fieldnames=FIELDS).writeheader()
+        f.writelines(rows.values())
+    os.replace(tmp, path)
+    return set(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep parallelo di goal_multiplier / penalty_multiplier")
+    parser.add_argument("--goal-multipliers", default=str(GOAL_MULTIPLIER))
+    parser.add_argument("--penalty-multipliers", default=str(PENALTY_MULTIPLIER))
+    parser.add_argument("--balances", default=str(STARTING_BALANCE))
+    parser.add_argument("--bets", default=",".join(str(v) for v in CHIP_VALUES))
+    parser.add_argument("--sessions", type=int, default=10_000, help="sessioni simulate per cella")
+    parser.add_argument("--max-shots", type=int, default=200, help="tiri massimi per sessione")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    grid = build_grid(parse_values(args.goal_multipliers), parse_values(args.penalty_multipliers),
+                      parse_values(args.balances, int), parse_values(args.bets, int))
+    try:
+        done = completed_cells(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    jobs = [(index, cell, args.sessions, args.max_shots, args.seed) for index, cell in grid
+            if cell_key(index, cell, args.sessions, args.max_shots, args.seed) not in done]
+    print(f"Celle: {len(grid)}  già completate: {len(grid) - len(jobs)}  da calcolare: {len(jobs)}")
+    if not jobs:
+        return
+
+    # completed_cells ha già scritto l'intestazione e le sole righe complete
+    with open(args.output, "a", newline="") as f, Pool(args.workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        for finished, row in enumerate(pool.imap_unordered(run_cell, jobs), 1):
+            writer.writerow(row)
+            f.flush()
+            if finished % 100 == 0 or finished == len(jobs):
+                print(f"{finished}/{len(jobs)} celle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Ripristino del registro del saldo dopo un crash: coda scritta a metà,
+# ripresa dallo snapshot e righe con CRC sbagliato.
+import os
+
+from ledger import Ledger, recover, _read_snapshot
+
+
+def write_entries(path, balances, **kwargs):
+    ledger = Ledger(path, sync_interval=0, **kwargs)
+    for balance in balances:
+        ledger.bet(10, balance)
+    ledger.close()
+    return ledger
+
+
+def test_recover_empty(tmp_path):
+    assert recover(str(tmp_path / "missing.log"), 1600) == (1600, 0, 0, 0)
+
+
+def test_torn_write_is_truncated(tmp_path):
+    path = str(tmp_path / "saldo.log")
+    write_entries(path, [1590, 1580, 1570])
+    valid = os.path.getsize(path)
+    with open(path, "ab") as f:
+        # Crash durante la scrittura della quarta voce
+        f.write(b'0badc0de {"seq":4,"op":"bet","amo')
+
+    balance, seq, offset, replayed = recover(path)
+    assert (balance, seq, offset, replayed) == (1570, 3, valid, 3)
+
+    # Riaprendo la coda rovinata si taglia e le voci nuove proseguono
+    ledger = Ledger(path, sync_interval=0)
+    assert os.path.getsize(path) == valid
+    ledger.bet(10, 1560)
+    ledger.close()
+    assert recover(path)[:2] == (1560, 4)
+
+
+def test_bad_crc_stops_replay(tmp_path):
+    path = str(tmp_path / "saldo.log")
+    write_entries(path, [1590, 1580, 1570])
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    # Un byte cambiato nel saldo della seconda voce
+    lines[1] = lines[1].replace(b"1580", b"9580")
+    with open(path, "wb") as f:
+        f.writelines(lines)
+
+    balance, seq, offset, replayed = recover(path)
+    assert (balance, seq, offset, replayed) == (1590, 1, len(lines[0]), 1)
+
+
+def test_resume_from_snapshot(tmp_path):
+    path = str(tmp_path / "saldo.log")
+    balances = list(range(1590, 1470, -10))
+    write_entries(path, balances, snapshot_every=5)
+    snapshot = _read_snapshot(path + ".snap")
+    assert snapshot is not None and snapshot["seq"] >= 5
+
+    balance, seq, offset, replayed = recover(path)
+    assert (balance, seq, offset) == (balances[-1], len(balances), os.path.getsize(path))
+    # Solo le voci dopo lo snapshot si rileggono
+    assert replayed == len(balances) - snapshot["seq"]
+
+    # Un crash dopo lo snapshot: si riparte dallo snapshot e si taglia la coda
+    with open(path, "ab") as f:
+        f.write(b"00000000 {")
+    ledger = Ledger(path, sync_interval=0)
+    assert (ledger.balance, ledger.seq, ledger.replayed) == (balances[-1], len(balances), replayed)
+    ledger.close()
+
+
+def test_snapshot_past_end_of_log_is_ignored(tmp_path):
+    path = str(tmp_path / "saldo.log")
+    balances = list(range(1590, 1470, -10))
+    write_entries(path, balances, snapshot_every=5)
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    # Log più corto dello snapshot (es. ripristinato da un backup)
+    with open(path, "wb") as f:
+        f.writelines(lines[:2])
+
+    assert recover(path) == (balances[1], 2, len(lines[0]) + len(lines[1]), 2)
@@ -0,0 +1,37 @@
+# Giro completo del replay: una sessione giocata dal bot di soak.py si
+# registra con --replay-log, si rilegge e si verifica con le sole regole.
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+import rigori
+import soak
+from replay import OP_CHIP, OP_SHOT, read_replay, replay_session
+
+
+def play(path, seed, plan):
+    monitor = soak.SoakMonitor()
+    bot = soak.SoakBot(monitor, cash_out_after=3, duration=1.0)
+    # Sempre le stesse fiche: il bot le clicca dall'ultima alla prima
+    bot.bet = lambda balance, rng: list(plan)
+    with pytest.raises(SystemExit):
+        rigori.main(fps=0, fast_forward=True, seed=seed, replay_log=str(path), idle=False, bot=bot)
+
+
+def test_record_load_verify(tmp_path):
+    path = tmp_path / "sessione.psr"
+    play(path, 7, [1, 0, 2])
+    with open(path, "rb") as f:
+        log = read_replay(f.read())
+    assert log["seed"] == 7
+
+    # Le fiche restano nell'ordine dei clic, non raggruppate per taglio
+    chips = [value for op, value in log["actions"] if op == OP_CHIP]
+    assert chips and chips == [2, 0, 1] * (len(chips) // 3)
+
+    result = replay_session(str(path))
+    assert result["ok"], result["mismatches"]
+    assert result["shots"] == sum(op == OP_SHOT for op, _ in log["actions"]) > 0
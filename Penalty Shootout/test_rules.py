@@ -0,0 +1,75 @@
+# La tabella degli esiti precalcolata deve coincidere con quello che succede
+# a schermo: ogni (bersaglio, tuffo) si gioca frame per frame con
+# PenaltyGame e si controlla la collisione come faceva check_shot_result
+# prima della tabella.
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import pytest
+
+import rigori
+from rules import (BALL_SIZE, KEEPER_SIZE, DIVES, DIVE_STAY, KEEPER_CATCH_INFLATE, TARGET_POSITIONS,
+                   GameRNG, dive_target, outcome_table)
+
+
+@pytest.fixture(scope="module")
+def assets():
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    yield rigori.GameAssets()
+    pygame.quit()
+
+
+def start_shot(assets, target, dive):
+    game = rigori.PenaltyGame(assets, 10 ** 6, 10, GameRNG(0))
+    # Come handle_events e reset_keeper, ma con il tuffo scelto
+    game.selected_target = target
+    game.ball_target = game.target_positions[target]
+    game.ball_moving = True
+    game.keeper_dive = dive
+    game.keeper_dive_target = dive_target(dive, game.keeper_rect.center)
+    game.keeper_moving = True
+    return game
+
+
+def play_shot(assets, target, dive):
+    game = start_shot(assets, target, dive)
+    collisions = []
+
+    def check_shot_result():
+        ball_rect = assets.ball.get_rect(center=game.ball_pos)
+        collisions.append(ball_rect.colliderect(game.keeper_rect.inflate(*KEEPER_CATCH_INFLATE)))
+
+    game.check_shot_result = check_shot_result
+    while game.ball_moving:
+        game.update()
+    assert len(collisions) == 1
+    return collisions[0]
+
+
+def test_sprite_sizes_match_rules(assets):
+    assert assets.ball.get_size() == BALL_SIZE
+    assert assets.keeper.get_size() == KEEPER_SIZE
+
+
+def test_outcome_table_matches_animation(assets):
+    table = outcome_table(assets.ball.get_size(), assets.keeper.get_size())
+    for target in range(len(TARGET_POSITIONS)):
+        for dive in DIVES:
+            assert table[target][dive] == play_shot(assets, target, dive), (target, dive)
+
+
+def test_animation_stops_after_stay_dive(assets):
+    # Il portiere resta fermo: dopo il tiro la schermata non è più animata
+    # e lo scheduler può aspettare l'input
+    game = start_shot(assets, 0, DIVE_STAY)
+    for _ in range(1000):
+        game.update()
+        if not game.is_animating():
+            break
+    assert game.result_text
+    assert not game.keeper_moving
+    assert not game.is_animating()
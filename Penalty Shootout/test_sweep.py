@@ -0,0 +1,67 @@
+# Ripresa dello sweep: le celle già nel file si saltano solo se hanno gli
+# stessi parametri della nuova esecuzione, e le righe troncate si scartano.
+import csv
+import sys
+
+import pytest
+
+import sweep
+
+
+def run(monkeypatch, output, *args):
+    argv = ["sweep.py", "--bets", "10", "--sessions", "50", "--max-shots", "20",
+            "--workers", "1", "--output", str(output), *args]
+    monkeypatch.setattr(sys, "argv", argv)
+    sweep.main()
+    with open(output, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def multipliers(rows):
+    return sorted((float(r["goal_multiplier"]), float(r["penalty_multiplier"])) for r in rows)
+
+
+def test_resume_skips_only_matching_cells(monkeypatch, tmp_path, capsys):
+    output = tmp_path / "sweep.csv"
+    first = run(monkeypatch, output, "--goal-multipliers", "1.5", "--penalty-multipliers", "4")
+    assert multipliers(first) == [(1.5, 4.0)]
+
+    # Stessi argomenti: niente da ricalcolare, il file non cambia
+    assert run(monkeypatch, output, "--goal-multipliers", "1.5", "--penalty-multipliers", "4") == first
+    assert "già completate: 1  da calcolare: 0" in capsys.readouterr().out
+
+
+def test_resume_after_grid_change(monkeypatch, tmp_path, capsys):
+    output = tmp_path / "sweep.csv"
+    run(monkeypatch, output, "--goal-multipliers", "1.5", "--penalty-multipliers", "4")
+    capsys.readouterr()
+
+    # Stesso indice di cella, altri moltiplicatori: la cella va calcolata
+    rows = run(monkeypatch, output, "--goal-multipliers", "3", "--penalty-multipliers", "1")
+    assert "già completate: 0  da calcolare: 1" in capsys.readouterr().out
+    assert multipliers(rows) == [(1.5, 4.0), (3.0, 1.0)]
+
+    # Anche seed e sessioni fanno parte della chiave
+    rows = run(monkeypatch, output, "--goal-multipliers", "3", "--penalty-multipliers", "1", "--seed", "1")
+    assert "già completate: 0  da calcolare: 1" in capsys.readouterr().out
+    assert sorted(int(r["seed"]) for r in rows) == [0, 0, 1]
+
+
+def test_truncated_row_is_recomputed(monkeypatch, tmp_path):
+    output = tmp_path / "sweep.csv"
+    complete = run(monkeypatch, output, "--goal-multipliers", "1.5", "--penalty-multipliers", "4")
+    with open(output) as f:
+        text = f.read()
+    # Interruzione a metà dell'ultimo campo
+    with open(output, "w") as f:
+        f.write(text[:-3])
+
+    assert run(monkeypatch, output, "--goal-multipliers", "1.5", "--penalty-multipliers", "4") == complete
+
+
+def test_other_format_is_not_overwritten(monkeypatch, tmp_path):
+    output = tmp_path / "sweep.csv"
+    output.write_text("cell,goal_multiplier\n0,1.5\n")
+    with pytest.raises(SystemExit):
+        run(monkeypatch, output, "--goal-multipliers", "1.5")
+    assert output.read_text() == "cell,goal_multiplier\n0,1.5\n"
@@ -0,0 +1,55 @@
+# Cache LRU condivisa delle scritte renderizzate: etichette, valori delle
+# fiche e saldi cambiano raramente, quindi font.render si chiama una volta
+# sola per ogni combinazione di (font, testo, colore, antialias).
+from collections import OrderedDict
+
+from render_scale import wrap
+
+TEXT_CACHE_SIZE = 256
+
+
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        # Con la scala di rendering il font è già scalato: la scritta si usa
+        # con le dimensioni logiche
+        surf = wrap(font.render(text, antialias, color))
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    # Le superfici restituite sono condivise: non vanno modificate
+    return text_cache.render(font, text, color, antialias)
@@ -0,0 +1,50 @@
+# Loop a passo fisso: la fisica (palla, portiere, particelle) avanza sempre
+# a PHYSICS_HZ passi al secondo, qualunque sia il frame rate del display.
+# Le velocità di move_ball e move_keeper sono espresse per passo, quindi a
+# 60 Hz il gioco si comporta esattamente come prima.
+from rules import FPS
+
+PHYSICS_HZ = FPS
+MAX_STEPS_PER_FRAME = 5
+
+
+class FixedTimestep:
+    def __init__(self, rate=PHYSICS_HZ, max_steps=MAX_STEPS_PER_FRAME, fast_forward=False):
+        self.step = 1.0 / rate
+        self.max_steps = max_steps
+        # In avanti veloce (headless, test) ogni frame fa un passo senza
+        # guardare l'orologio, quindi la simulazione va alla velocità della CPU
+        self.fast_forward = fast_forward
+        self.accumulator = 0.0
+        self.steps = 0
+        self.dropped_time = 0.0
+
+    def advance(self, dt):
+        # Restituisce quanti passi di fisica eseguire per questo frame
+        if self.fast_forward:
+            self.steps += 1
+            return 1
+
+        self.accumulator += dt
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            # Macchina troppo lenta: si salta il ritardo invece di rallentare
+            # il gioco o accumulare passi all'infinito
+            self.dropped_time += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator = self.step * steps + self.accumulator % self.step
+        self.accumulator -= steps * self.step
+        self.steps += steps
+        return steps
+
+    def stats(self):
+        # Passi eseguiti e tempo di gioco saltato perché il frame è durato
+        # più di max_steps passi
+        return {"steps": self.steps, "dropped_ms": self.dropped_time * 1000}
+
+    @property
+    def alpha(self):
+        # Frazione del passo successivo già trascorsa, per interpolare il disegno
+        if self.fast_forward:
+            return 1.0
+        return min(1.0, self.accumulator / self.step)
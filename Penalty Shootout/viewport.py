@@ -0,0 +1,142 @@
+# Scala di rendering: il gioco disegna sempre con le coordinate logiche
+# WIDTH x HEIGHT su una tela, il frame, che ha WIDTH*s x HEIGHT*s pixel
+# (render_scale; s = 1 di norma, 0.5 o 0.75 su macchine lente) e a ogni
+# frame si scala una sola volta nella finestra vera, anche più grande o a
+# schermo intero. Se le proporzioni non coincidono restano bande nere.
+# Le posizioni del mouse si riportano alle coordinate logiche prima di
+# arrivare alle schermate.
+import math
+
+import numpy as np
+import pygame
+
+from render_scale import ScaledSurface, pixels
+from rules import WIDTH, HEIGHT
+
+LOGICAL_SIZE = (WIDTH, HEIGHT)
+MOUSE_EVENTS = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+
+def fit_rect(size, window):
+    # Rettangolo più grande con le proporzioni di size, centrato in window
+    scale = min(window[0] / size[0], window[1] / size[1])
+    rect = pygame.Rect(0, 0, round(size[0] * scale), round(size[1] * scale))
+    rect.center = (window[0] // 2, window[1] // 2)
+    return rect
+
+
+def scale_map(size, scaled):
+    # Per ogni pixel scalato, la colonna della tela che vi copia
+    # pygame.transform.scale: le zone sporche si scalano con lo stesso
+    # campionamento del frame completo
+    probe = pygame.Surface((size, 1), 0, 32)
+    pygame.surfarray.pixels2d(probe)[:, 0] = np.arange(size)
+    return pygame.surfarray.array2d(pygame.transform.scale(probe, (scaled, 1)))[:, 0].astype(np.intp)
+
+
+class Viewport:
+    def __init__(self, window_size=LOGICAL_SIZE, fullscreen=False, smooth=False, render_scale=1.0):
+        if fullscreen:
+            self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.window = pygame.display.set_mode(window_size)
+        self.smooth = smooth
+        self.render_scale = render_scale
+        size = pixels(LOGICAL_SIZE, render_scale)
+        self.rect = fit_rect(LOGICAL_SIZE, self.window.get_size())
+        self.scaled = self.window.get_size() != size
+        if self.scaled:
+            self.frame = pygame.Surface(size).convert()
+            self.window.fill((0, 0, 0))
+            self.target = self.window.subsurface(self.rect)
+            self.sx = self.rect.width / size[0]
+            self.sy = self.rect.height / size[1]
+            self.xmap = scale_map(size[0], self.rect.width)
+            self.ymap = scale_map(size[1], self.rect.height)
+        else:
+            # Finestra grande quanto il frame: si disegna direttamente lì
+            self.frame = self.window
+        # Le schermate disegnano sulla tela con le coordinate logiche
+        if render_scale == 1:
+            self.canvas = self.frame
+        else:
+            self.canvas = ScaledSurface(self.frame, render_scale, LOGICAL_SIZE)
+
+    def to_frame(self, pos):
+        # Il pixel del frame che si vede sotto il cursore
+        if not self.scaled:
+            return tuple(pos)
+        x = pos[0] - self.rect.x
+        y = pos[1] - self.rect.y
+        if 0 <= x < self.rect.width and 0 <= y < self.rect.height:
+            return (int(self.xmap[x]), int(self.ymap[y]))
+        # Sulle bande nere: fuori dalla tela, lontano da ogni pulsante
+        return (math.floor(x / self.sx), math.floor(y / self.sy))
+
+    def to_logical(self, pos):
+        x, y = self.to_frame(pos)
+        if self.render_scale == 1:
+            return (x, y)
+        # Il punto logico al centro del pixel del frame
+        return (math.floor((x + 0.5) / self.render_scale), math.floor((y + 0.5) / self.render_scale))
+
+    def map_events(self, events):
+        if not self.scaled and self.render_scale == 1:
+            return events
+        sx = (self.sx if self.scaled else 1) * self.render_scale
+        sy = (self.sy if self.scaled else 1) * self.render_scale
+        mapped = []
+        for event in events:
+            if event.type in MOUSE_EVENTS:
+                attrs = dict(event.dict, pos=self.to_logical(event.pos))
+                if event.type == pygame.MOUSEMOTION:
+                    attrs["rel"] = (int(event.rel[0] / sx), int(event.rel[1] / sy))
+                event = pygame.event.Event(event.type, attrs)
+            mapped.append(event)
+        return mapped
+
+    def frame_rect(self, rect):
+        # Pixel del frame toccati da un rettangolo logico
+        if self.render_scale == 1:
+            return pygame.Rect(rect)
+        return self.canvas.bounds(rect)
+
+    def to_window(self, rect):
+        # Pixel della finestra il cui campione cade dentro rect del frame
+        left, right = np.searchsorted(self.xmap, (rect.left, rect.right)).tolist()
+        top, bottom = np.searchsorted(self.ymap, (rect.top, rect.bottom)).tolist()
+        return pygame.Rect(self.rect.x + left, self.rect.y + top, right - left, bottom - top)
+
+    # flip e update come pygame.display, con le coordinate logiche
+
+    def flip(self):
+        if self.scaled:
+            if self.smooth:
+                pygame.transform.smoothscale(self.frame, self.rect.size, self.target)
+            else:
+                pygame.transform.scale(self.frame, self.rect.size, self.target)
+        pygame.display.flip()
+
+    def update(self, rects):
+        rects = [self.frame_rect(rect) for rect in rects]
+        if not self.scaled:
+            pygame.display.update(rects)
+            return
+        if self.smooth:
+            # smoothscale mescola pixel vicini: solo il frame intero è esatto
+            pygame.transform.smoothscale(self.frame, self.rect.size, self.target)
+            pygame.display.update([self.to_window(rect) for rect in rects])
+            return
+        frame = pygame.surfarray.pixels2d(self.frame)
+        window = pygame.surfarray.pixels2d(self.window)
+        updated = []
+        for rect in rects:
+            area = self.to_window(rect)
+            if area.width and area.height:
+                xs = self.xmap[area.left - self.rect.x:area.right - self.rect.x]
+                ys = self.ymap[area.top - self.rect.y:area.bottom - self.rect.y]
+                window[area.left:area.right, area.top:area.bottom] = frame[np.ix_(xs, ys)]
+                updated.append(area)
+        # Sblocca le superfici prima dell'update
+        del frame, window
+        pygame.display.update(updated)